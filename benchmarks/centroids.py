@@ -0,0 +1,103 @@
+"""Centróides float64 (padrão) vs. modo compacto (float32, checkpoint comprimido, predict top-m).
+
+Treina o MiniBatchKMeans com partial_fit sobre documentos sintéticos em cada modo e mede o pico
+de RSS do treinamento, o tamanho do checkpoint em disco e a latência do predict (com a
+concordância do predict top-m em relação ao predict completo do mesmo modelo).
+
+Uso: python -m benchmarks.centroids --documents 200000 --n-clusters 300 --top-m 1024 4096
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.metrics import adjusted_rand_score
+
+from benchmarks.document_store import synthetic_documents
+from benchmarks.suite import PeakMemory, directory_size
+from model.centroids import SparseCentroids
+from model.model_io import kmeans_config, save_model_files
+
+def train_kmeans(documents, dtype, n_clusters, batch_size):
+    vectorizer = HashingVectorizer(n_features=2**18, alternate_sign=False, dtype=dtype)
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, max_iter=200, random_state=42)
+    gc.collect()
+    with PeakMemory() as memory:
+        baseline = memory.peak
+        start = time.perf_counter()
+        for i in range(0, len(documents), batch_size):
+            kmeans.partial_fit(vectorizer.transform(documents[i:i + batch_size]))
+        seconds = time.perf_counter() - start
+    return vectorizer, kmeans, {"train_seconds": seconds, "peak_rss_delta_mb": (memory.peak - baseline) / 1e6,
+                                "centroids_mb": kmeans.cluster_centers_.nbytes / 1e6}
+
+def checkpoint_size(kmeans, compress):
+    params, state = kmeans_config(kmeans)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'checkpoint')
+        start = time.perf_counter()
+        save_model_files(path, {'kmeans': params, 'kmeans_state': state},
+                         {'cluster_centers': kmeans.cluster_centers_, 'counts': kmeans._counts}, compress=compress)
+        return {"checkpoint_mb": directory_size(path) / 1e6, "checkpoint_save_seconds": time.perf_counter() - start}
+
+def predict_latency(predict, X, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        labels = predict(X)
+        timings.append(time.perf_counter() - start)
+    return labels, min(timings) / X.shape[0] * 1e6
+
+def benchmark_centroids(n_documents=200000, n_clusters=300, batch_size=10000, top_m=(1024, 4096), n_queries=10000,
+                        seed=42):
+    documents = synthetic_documents(n_documents, seed=seed)
+    queries = synthetic_documents(n_queries, seed=seed + 1)
+    results = {"documents": n_documents, "n_clusters": n_clusters, "batch_size": batch_size, "modes": {}}
+
+    vectorizer, kmeans, result = train_kmeans(documents, np.float64, n_clusters, batch_size)
+    result.update(checkpoint_size(kmeans, compress=False))
+    X = vectorizer.transform(queries)
+    reference, result["predict_us_per_doc"] = predict_latency(kmeans.predict, X)
+    results["modes"]["float64"] = result
+    del kmeans, X
+
+    vectorizer, kmeans, result = train_kmeans(documents, np.float32, n_clusters, batch_size)
+    result.update(checkpoint_size(kmeans, compress=True))
+    X = vectorizer.transform(queries)
+    labels, result["predict_us_per_doc"] = predict_latency(kmeans.predict, X)
+    # Modelos treinados separadamente numeram os clusters de forma diferente; o ARI compara as partições
+    result["adjusted_rand_vs_float64"] = float(adjusted_rand_score(reference, labels))
+    results["modes"]["compact"] = result
+
+    for m in top_m:
+        start = time.perf_counter()
+        sparse_centroids = SparseCentroids(kmeans.cluster_centers_, m)
+        build_seconds = time.perf_counter() - start
+        sparse_labels, latency = predict_latency(sparse_centroids.predict, X)
+        results["modes"][f"compact_top_{m}"] = {
+            "build_seconds": build_seconds,
+            "centroids_mb": sum(array.nbytes for array in (sparse_centroids.centers.data, sparse_centroids.centers.indices,
+                                                           sparse_centroids.centers.indptr)) / 1e6,
+            "predict_us_per_doc": latency,
+            "agreement_with_full_predict": float(np.mean(sparse_labels == labels))
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=200000)
+    parser.add_argument('--n-clusters', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--top-m', type=int, nargs='*', default=[1024, 4096])
+    parser.add_argument('--queries', type=int, default=10000)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_centroids(args.documents, args.n_clusters, args.batch_size, args.top_m, args.queries),
+                     indent=2))
+
+if __name__ == "__main__":
+    main()
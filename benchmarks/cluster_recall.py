@@ -0,0 +1,73 @@
+"""Recall@k da busca podada por clusters comparada à busca exaustiva no índice invertido.
+
+Uso: python -m benchmarks.cluster_recall --k 5 --n-probe 1 5 10 20 [--queries perguntas.txt]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from model.content_ranker import ContentRanker
+
+def sample_queries(ranker, n_queries, n_words=8, seed=42):
+    # Sem arquivo de perguntas, usa trechos de documentos do próprio corpus
+    cursor = ranker.db_connection.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM documents")
+    max_id = cursor.fetchone()[0]
+    rng = np.random.default_rng(seed)
+    queries = []
+    for doc_id in rng.integers(1, max_id + 1, size=n_queries).tolist():
+        cursor.execute("SELECT content FROM documents WHERE id = ?", (doc_id,))
+        row = cursor.fetchone()
+        if row and row[0]:
+            queries.append(' '.join(row[0].split()[:n_words]))
+    return queries
+
+def cluster_recall(ranker, queries, k=5, n_probes=(1, 5, 10, 20)):
+    query_vecs = [ranker.vectorizer.transform([ranker.preprocess_text(query)]) for query in queries]
+
+    start = time.perf_counter()
+    exact = [ranker.index.search(query_vec, k) for query_vec in query_vecs]
+    exhaustive_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+    results = {"k": k, "queries": len(queries), "exhaustive_ms_per_query": exhaustive_ms, "n_probe": {}}
+    for n_probe in n_probes:
+        start = time.perf_counter()
+        pruned = [ranker.rank_in_clusters(query_vec, k, n_probe) for query_vec in query_vecs]
+        pruned_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+        recalls = []
+        for exact_hits, pruned_hits in zip(exact, pruned):
+            if not exact_hits:
+                continue
+            exact_ids = {doc_id for doc_id, _ in exact_hits}
+            recalls.append(len(exact_ids & {doc_id for doc_id, _ in pruned_hits}) / len(exact_ids))
+        results["n_probe"][n_probe] = {
+            "recall_at_k": float(np.mean(recalls)) if recalls else 0.0,
+            "ms_per_query": pruned_ms
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', help="Arquivo com uma pergunta por linha")
+    parser.add_argument('--n-queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 5, 10, 20])
+    args = parser.parse_args()
+
+    ranker = ContentRanker()
+    if not ranker.load_checkpoint() or not ranker.has_centroids():
+        raise SystemExit("Nenhum modelo treinado encontrado para o benchmark.")
+
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as file:
+            queries = [line.strip() for line in file if line.strip()]
+    else:
+        queries = sample_queries(ranker, args.n_queries)
+
+    print(json.dumps(cluster_recall(ranker, queries, args.k, args.n_probe), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Vazão de ingestão e de consulta por id do DocumentStore.
+
+Uso: python -m benchmarks.document_store --documents 200000 --batch-size 10000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from model.document_store import DocumentStore
+
+def synthetic_documents(n_documents, n_words=12, vocabulary_size=50000, seed=42):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f'termo{i}' for i in range(vocabulary_size)])
+    words = vocabulary[rng.zipf(1.3, size=(n_documents, n_words)) % vocabulary_size]
+    return [' '.join(row) for row in words]
+
+def benchmark_document_store(n_documents=200000, batch_size=10000, n_lookups=2000, k=5, seed=42):
+    vectorizer = HashingVectorizer(n_features=2**18, alternate_sign=False)
+    documents = synthetic_documents(n_documents, seed=seed)
+    batches = [(documents[i:i + batch_size], vectorizer.transform(documents[i:i + batch_size]))
+               for i in range(0, n_documents, batch_size)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = DocumentStore(os.path.join(directory, 'benchmark.db'), vectorizer.n_features)
+
+        start = time.perf_counter()
+        for offset, (batch, X) in enumerate(batches):
+            store.add_documents(batch, X, source='benchmark', offsets=list(range(offset, offset + len(batch))))
+        ingest_seconds = time.perf_counter() - start
+
+        rng = np.random.default_rng(seed)
+        lookups = rng.integers(1, n_documents + 1, size=(n_lookups, k)).tolist()
+        start = time.perf_counter()
+        for doc_ids in lookups:
+            store.fetch(doc_ids)
+        lookup_seconds = time.perf_counter() - start
+
+        db_size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        store.close()
+
+    return {
+        "documents": n_documents,
+        "batch_size": batch_size,
+        "ingest_docs_per_second": n_documents / ingest_seconds,
+        "lookups": n_lookups,
+        "lookup_k": k,
+        "lookups_per_second": n_lookups / lookup_seconds,
+        "lookup_ms": lookup_seconds * 1000 / n_lookups,
+        "db_bytes": db_size
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_document_store(args.documents, args.batch_size, args.lookups, args.k), indent=2))
+
+if __name__ == "__main__":
+    main()
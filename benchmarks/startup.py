@@ -0,0 +1,104 @@
+"""Tempo de inicialização do main.py e verificação de que dependências pesadas não são importadas cedo.
+
+Cada medida roda em um processo Python novo (sem cache de módulos). Mede até os prompts de um modelo
+novo (sem sklearn/scipy) e o load_or_create_model() completo, criando um modelo novo e carregando um
+checkpoint. Termina com código 1 se algum módulo pesado for importado antes dos prompts, se esse tempo
+passar de --max-seconds ou se o load_or_create_model() passar de --max-load-seconds.
+
+Uso: python -m benchmarks.startup --repeat 5 --max-seconds 1.0 --max-load-seconds 3.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ('sklearn', 'scipy', 'joblib', 'psutil', 'nltk', 'numba', 'spacy')
+
+# Até os prompts de um modelo novo: importar o main e checar checkpoints
+STARTUP_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import main
+from model.checkpoint_manager import has_checkpoint
+has_checkpoint()
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'heavy': sorted(m for m in %r if m in sys.modules)}))
+""" % (HEAVY_MODULES,)
+
+# Caminho real da abertura do programa; os prompts de um modelo novo recebem os valores padrão pelo stdin.
+# O resultado vai em uma linha própria, depois dos prompts
+LOAD_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import main
+main.load_or_create_model()
+print('\\n' + json.dumps({'seconds': time.perf_counter() - start, 'heavy': []}))
+"""
+
+# Cria um checkpoint pequeno no diretório atual para medir o carregamento
+CHECKPOINT_SETUP_SNIPPET = """
+import json
+from model.content_ranker import ContentRanker
+with open('dados.txt', 'w', encoding='utf-8') as file:
+    file.write('python lista compreensão\\nreceita de bolo de cenoura\\npython dicionário\\n')
+result = ContentRanker(n_clusters=2).train('dados.txt')['result']
+print(json.dumps({'seconds': 0.0, 'heavy': [], 'result': result}))
+"""
+
+# Referência: custo de importar o modelo completo (sklearn, scipy...)
+MODEL_IMPORT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import model.content_ranker
+print(json.dumps({'seconds': time.perf_counter() - start, 'heavy': []}))
+"""
+
+def run_snippet(snippet, root, cwd, stdin=''):
+    # main.py cria training.log no diretório atual: o processo roda em cwd (temporário), com o
+    # repositório no PYTHONPATH, para não deixar arquivos na árvore de trabalho
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    output = subprocess.run([sys.executable, '-c', snippet], cwd=cwd, env=env, input=stdin, capture_output=True,
+                            text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def benchmark_startup(repeat=5, root=None):
+    root = root or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as cwd, tempfile.TemporaryDirectory() as checkpoint_cwd:
+        startup = [run_snippet(STARTUP_SNIPPET, root, cwd) for _ in range(repeat)]
+        model_import = [run_snippet(MODEL_IMPORT_SNIPPET, root, cwd) for _ in range(repeat)]
+        # Sem checkpoint: create_new_model() com os padrões dos três prompts
+        load_new = [run_snippet(LOAD_SNIPPET, root, cwd, stdin='\n' * 3) for _ in range(repeat)]
+        if run_snippet(CHECKPOINT_SETUP_SNIPPET, root, checkpoint_cwd)['result'] != 'completed':
+            raise RuntimeError("Falha ao criar o checkpoint de referência.")
+        load_checkpoint = [run_snippet(LOAD_SNIPPET, root, checkpoint_cwd) for _ in range(repeat)]
+    return {
+        "repeat": repeat,
+        "startup_seconds_median": statistics.median(run['seconds'] for run in startup),
+        "startup_seconds_max": max(run['seconds'] for run in startup),
+        "load_new_model_seconds_median": statistics.median(run['seconds'] for run in load_new),
+        "load_checkpoint_seconds_median": statistics.median(run['seconds'] for run in load_checkpoint),
+        "model_import_seconds_median": statistics.median(run['seconds'] for run in model_import),
+        "heavy_modules_at_startup": sorted({module for run in startup for module in run['heavy']})
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=1.0)
+    parser.add_argument('--max-load-seconds', type=float, default=3.0)
+    args = parser.parse_args()
+    results = benchmark_startup(args.repeat)
+    results["max_seconds"] = args.max_seconds
+    results["max_load_seconds"] = args.max_load_seconds
+    results["passed"] = not results["heavy_modules_at_startup"] and \
+        results["startup_seconds_median"] <= args.max_seconds and \
+        max(results["load_new_model_seconds_median"], results["load_checkpoint_seconds_median"]) <= \
+        args.max_load_seconds
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if results["passed"] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Suíte de benchmarks de ponta a ponta sobre corpora sintéticos determinísticos.
+
+Para cada tamanho de corpus mede: limpeza (MB/s), treinamento (docs/s e pico de RSS),
+gravação/carga de checkpoint e do modelo, e latência do answer_query (p50/p90/p99).
+O resultado é um JSON, para comparar execuções (--output grava em arquivo).
+
+Uso: python -m benchmarks.suite --sizes 10k 1m --n-clusters 100 --output resultados.json
+     python -m benchmarks.suite --sizes 1m --projection random --projection-dim 256
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from benchmarks.document_store import synthetic_documents
+from model.content_ranker import ContentRanker, load_model
+from model.dataset_cleaner import clean_and_verify_dataset
+
+GENERATION_CHUNK = 100000
+
+def parse_size(size):
+    size = str(size).lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(size[-1], 1)
+    return int(float(size.rstrip('km')) * multiplier)
+
+def write_corpus(path, n_lines, seed=42):
+    # Mesmo gerador (Zipf) do benchmark do DocumentStore, gravado em blocos; ~1% das linhas
+    # recebe caracteres de controle para a limpeza ter trabalho de verdade
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        for chunk, start in enumerate(range(0, n_lines, GENERATION_CHUNK)):
+            documents = synthetic_documents(min(GENERATION_CHUNK, n_lines - start), seed=seed + chunk)
+            noisy = set(np.flatnonzero(rng.random(len(documents)) < 0.01).tolist())
+            file.writelines(f"{doc}\x07\n" if i in noisy else f"{doc}\n" for i, doc in enumerate(documents))
+    return os.path.getsize(path)
+
+class PeakMemory:
+    """Amostra o RSS do processo (e dos filhos, no treinamento paralelo) em segundo plano."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._process = psutil.Process()
+
+    def sample(self):
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.peak = max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+def latency_percentiles(latencies):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    return {"p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "mean_ms": float(np.mean(latencies)) * 1000}
+
+def sample_queries(corpus_path, n_queries, n_words=4, seed=42):
+    with open(corpus_path, 'r', encoding='utf-8') as file:
+        lines = [line for _, line in zip(range(max(n_queries * 10, 1000)), file)]
+    rng = np.random.default_rng(seed)
+    return [' '.join(lines[i].split()[:n_words]) for i in rng.integers(0, len(lines), size=n_queries)]
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def benchmark_size(n_lines, directory, n_clusters=100, batch_size=10000, n_workers=1, n_queries=500, seed=42,
+                   projection=None, projection_dim=256):
+    corpus = os.path.join(directory, 'corpus.txt')
+    result = {"lines": n_lines}
+
+    start = time.perf_counter()
+    result["corpus_bytes"] = write_corpus(corpus, n_lines, seed)
+    result["generation_seconds"] = time.perf_counter() - start
+
+    cleaning = clean_and_verify_dataset(corpus, clean=True)
+    result["clean"] = {"mb_per_second": cleaning["mb_per_second"], "seconds": cleaning["elapsed_seconds"],
+                       "cleaned_lines": cleaning["cleaned_lines"]}
+
+    def new_ranker():
+        return ContentRanker(n_clusters=n_clusters, batch_size=batch_size, checkpoint_interval=10**9,
+                             n_workers=n_workers, checkpoint_dir=os.path.join(directory, 'checkpoints'),
+                             db_path=os.path.join(directory, 'benchmark.db'), feature_cache_dir=None,
+                             projection=projection, projection_dim=projection_dim)
+
+    ranker = new_ranker()
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        outcome = ranker.train(corpus)
+        train_seconds = time.perf_counter() - start
+    if outcome["result"] != "completed":
+        raise RuntimeError(f"Treinamento do benchmark terminou com '{outcome['result']}'.")
+    result["train"] = {
+        "documents": outcome["documents_processed"],
+        "seconds": train_seconds,
+        "docs_per_second": outcome["documents_processed"] / train_seconds,
+        "mb_per_second": result["corpus_bytes"] / train_seconds / 1e6,
+        "peak_rss_mb": memory.peak / 1e6,
+        "n_workers": n_workers,
+        "batch_size": batch_size
+    }
+
+    start = time.perf_counter()
+    ranker.save_checkpoint(wait=True)
+    checkpoint_save = time.perf_counter() - start
+    model_path = os.path.join(directory, 'model')
+    start = time.perf_counter()
+    ranker.save_model(model_path)
+    model_save = time.perf_counter() - start
+    ranker.store.close()
+
+    loader = new_ranker()
+    start = time.perf_counter()
+    loader.load_checkpoint()
+    checkpoint_load = time.perf_counter() - start
+    loader.store.close()
+    start = time.perf_counter()
+    ranker = load_model(model_path)
+    model_load = time.perf_counter() - start
+    result["checkpoint"] = {"save_seconds": checkpoint_save, "load_seconds": checkpoint_load,
+                            "model_save_seconds": model_save, "model_load_seconds": model_load,
+                            "model_mb": directory_size(model_path) / 1e6}
+    if ranker.embeddings is not None:
+        result["checkpoint"]["embeddings_mb"] = directory_size(ranker.embeddings.directory) / 1e6
+
+    # Sem cache de consultas: mede o caminho completo de cada pergunta
+    ranker.query_cache.max_size = 0
+    queries = sample_queries(corpus, n_queries, seed=seed)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        ranker.answer_query(query)
+        latencies.append(time.perf_counter() - start)
+    result["answer_query"] = dict(latency_percentiles(latencies), queries=len(queries))
+
+    start = time.perf_counter()
+    for _ in ranker.answer_many(queries):
+        pass
+    result["answer_many"] = {"queries_per_second": len(queries) / (time.perf_counter() - start)}
+    ranker.store.close()
+    return result
+
+def run_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "memory_gb": psutil.virtual_memory().total / 1e9
+    }
+
+def run_suite(sizes, n_clusters=100, batch_size=10000, n_workers=1, n_queries=500, seed=42, projection=None,
+              projection_dim=256):
+    results = {"meta": run_metadata(), "config": {"n_clusters": n_clusters, "batch_size": batch_size,
+                                                  "n_workers": n_workers, "n_queries": n_queries, "seed": seed,
+                                                  "projection": projection, "projection_dim": projection_dim},
+               "results": []}
+    cwd = os.getcwd()
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            # Checkpoints antigos são procurados no diretório atual; o benchmark roda isolado
+            # e as mensagens de progresso do treinamento vão para o stderr, deixando só o JSON no stdout
+            os.chdir(directory)
+            try:
+                print(f"\nBenchmark com {parse_size(size)} linhas...", file=sys.stderr)
+                with contextlib.redirect_stdout(sys.stderr):
+                    result = benchmark_size(parse_size(size), directory, n_clusters, batch_size, n_workers, n_queries,
+                                            seed, projection, projection_dim)
+                results["results"].append(dict(result, size=size))
+            finally:
+                os.chdir(cwd)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['10k'], help="Tamanhos do corpus, ex.: 10k 1m 10m")
+    parser.add_argument('--n-clusters', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--projection', choices=['random', 'svd'], default=None)
+    parser.add_argument('--projection-dim', type=int, default=256)
+    parser.add_argument('--output', help="Arquivo JSON para gravar os resultados")
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.n_clusters, args.batch_size, args.workers, args.queries, args.seed,
+                        args.projection, args.projection_dim)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
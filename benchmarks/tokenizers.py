@@ -0,0 +1,78 @@
+"""Vazão dos tokenizadores de preprocess_text e concordância com o caminho NLTK.
+
+Uso: python -m benchmarks.tokenizers --documents 50000
+     python -m benchmarks.tokenizers --file data/dataset.txt --documents 100000
+"""
+import argparse
+import json
+import time
+from itertools import islice
+
+import numpy as np
+
+from model.tokenizers import TOKENIZERS, get_tokenizer
+
+SAMPLE_SENTENCES = [
+    "O modelo não encontrou informações relevantes sobre a pergunta.",
+    "A análise de dados é essencial, porém exige atenção às exceções!",
+    "Ele disse: \"vamos treinar o ranker em 3 etapas\" (e funcionou).",
+    "Coração, ação e informação são palavras com acentos e cedilha.",
+    "The quick brown fox doesn't jump over the lazy dog's 2 bones.",
+    "E-mails como contato@exemplo.com.br e URLs https://exemplo.org aparecem no texto.",
+    "Preço: R$ 1.234,56 — desconto de 15% até 31/12/2024.",
+    "Self-attention models aren't always better; it depends on the data..."
+]
+
+def synthetic_documents(n_documents, sentences_per_document=4, seed=42):
+    rng = np.random.default_rng(seed)
+    choices = rng.integers(0, len(SAMPLE_SENTENCES), size=(n_documents, sentences_per_document))
+    return [' '.join(SAMPLE_SENTENCES[i] for i in row) for row in choices]
+
+def file_documents(file_path, n_documents):
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+        return [line.strip() for line in islice((line for line in file if line.strip()), n_documents)]
+
+def benchmark_tokenizers(documents, tokenizers=None, reference='nltk'):
+    tokenizers = list(tokenizers or TOKENIZERS)
+    n_bytes = sum(len(doc.encode('utf-8')) for doc in documents)
+    results = {"documents": len(documents), "bytes": n_bytes, "tokenizers": {}}
+    outputs = {}
+
+    for name in tokenizers:
+        tokenize = get_tokenizer(name)
+        try:
+            tokenize(documents[0])
+        except Exception as e:
+            results["tokenizers"][name] = {"error": str(e)}
+            continue
+        start = time.perf_counter()
+        outputs[name] = [' '.join(tokenize(doc)) for doc in documents]
+        seconds = time.perf_counter() - start
+        results["tokenizers"][name] = {
+            "seconds": seconds,
+            "docs_per_second": len(documents) / seconds,
+            "mb_per_second": n_bytes / seconds / 1e6,
+            "tokens": sum(len(doc.split()) for doc in outputs[name])
+        }
+
+    # Fração de documentos com saída idêntica à do tokenizador de referência
+    if reference in outputs:
+        for name, output in outputs.items():
+            same = sum(a == b for a, b in zip(output, outputs[reference]))
+            results["tokenizers"][name]["agreement_with_" + reference] = same / len(documents)
+            if name != reference:
+                results["tokenizers"][name]["speedup_vs_" + reference] = \
+                    results["tokenizers"][reference]["seconds"] / results["tokenizers"][name]["seconds"]
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=50000)
+    parser.add_argument('--file', default=None, help="Usa as primeiras linhas deste arquivo no lugar do texto sintético")
+    parser.add_argument('--tokenizers', nargs='+', default=None, choices=sorted(TOKENIZERS))
+    args = parser.parse_args()
+    documents = file_documents(args.file, args.documents) if args.file else synthetic_documents(args.documents)
+    print(json.dumps(benchmark_tokenizers(documents, args.tokenizers), indent=2))
+
+if __name__ == "__main__":
+    main()
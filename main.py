@@ -1,4 +1,4 @@
-from model.content_ranker import ContentRanker, load_model
+from model.checkpoint_manager import has_checkpoint
 import os
 import logging
 import signal
@@ -121,7 +121,14 @@ def train_model(ranker, dataset_path=None):
         else:
             print("Ocorreu um erro durante o treinamento. Verifique os logs para mais detalhes.")
         
-        print(f"Progresso total: {(training_outcome['documents_processed'] / training_outcome['total_documents']) * 100:.2f}%")
+        if training_outcome["duplicates_skipped"] or training_outcome["near_duplicates_skipped"]:
+            print(f"Duplicados ignorados: {training_outcome['duplicates_skipped']} exatos, "
+                  f"{training_outcome['near_duplicates_skipped']} quase idênticos.")
+        print(f"Progresso total: {training_outcome['progress']:.2f}% do arquivo")
+        if training_outcome["metrics"]:
+            print("Tempo por etapa:")
+            for stage, stats in list(training_outcome["metrics"]["stages"].items())[:8]:
+                print(f"  {stage}: {stats['seconds']:.2f}s ({stats['share']:.0%})")
     except Exception as e:
         logging.error(f"Erro durante o treinamento: {e}")
         print("Ocorreu um erro durante o treinamento. Verifique os logs para mais detalhes.")
@@ -137,6 +144,8 @@ def increment_model(ranker):
         if increment_outcome["result"] == "completed":
             print(f"Incremento concluído com sucesso!")
             print(f"Novos documentos processados: {increment_outcome['new_documents_processed']}")
+            print(f"Duplicados ignorados: {increment_outcome['duplicates_skipped']} exatos, "
+                  f"{increment_outcome['near_duplicates_skipped']} quase idênticos.")
         elif increment_outcome["result"] == "interrupted":
             print(f"Incremento interrompido. Novos documentos processados antes da interrupção: {increment_outcome['new_documents_processed']}")
         else:
@@ -162,14 +171,19 @@ def save_model(ranker):
 def create_new_model():
     checkpoint_interval = int(input("Digite o intervalo de checkpoint em segundos (padrão 3600 (1h)): ") or 3600)
     max_checkpoints = int(input("Digite o número máximo de checkpoints a manter (padrão 3): ") or 3)
-    ranker = ContentRanker(checkpoint_interval=checkpoint_interval, max_checkpoints=max_checkpoints)
+    n_workers = int(input("Digite o número de processos para o treinamento (padrão 1): ") or 1)
+    # Importado só depois dos prompts: sklearn/scipy não atrasam a abertura do programa
+    from model.content_ranker import ContentRanker
+    ranker = ContentRanker(checkpoint_interval=checkpoint_interval, max_checkpoints=max_checkpoints,
+                           n_workers=n_workers)
     return ranker
 
 def load_or_create_model():
-    if ContentRanker().has_checkpoint():
+    if has_checkpoint():
         print("Checkpoints encontrados. Carregando o mais recente...")
+        from model.content_ranker import ContentRanker
         ranker = ContentRanker()
-        ranker.load_checkpoint()
+        ranker.load_checkpoint(settings=True)
         return ranker
     else:
         print("Nenhum checkpoint encontrado. Criando novo modelo...")
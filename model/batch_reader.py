@@ -0,0 +1,60 @@
+import mmap
+import os
+
+LINE_COUNT_BLOCK_SIZE = 16 * 1024 * 1024
+
+def batch_size_getter(batch_size):
+    # batch_size pode ser um inteiro ou uma função consultada a cada lote (tamanho dinâmico)
+    return batch_size if callable(batch_size) else lambda: batch_size
+
+def iter_batch_offsets(mm, batch_size, start=0):
+    # Lotes de até batch_size linhas completas, delimitados por posições de '\n' no mmap
+    current_batch_size = batch_size_getter(batch_size)
+    size = len(mm)
+    position = start
+    while position < size:
+        end = position
+        for _ in range(current_batch_size()):
+            newline = mm.find(b'\n', end)
+            if newline == -1:
+                end = size
+                break
+            end = newline + 1
+            if end >= size:
+                break
+        yield position, end
+        position = end
+
+def read_lines(mm, start, end):
+    # Decodifica cada linha a partir de uma fatia do mmap, sem copiar o lote inteiro;
+    # retorna pares (offset em bytes da linha, texto)
+    lines = []
+    with memoryview(mm) as view:
+        position = start
+        while position < end:
+            newline = mm.find(b'\n', position, end)
+            line_end = end if newline == -1 else newline
+            with view[position:line_end] as raw_line:
+                lines.append((position, str(raw_line, 'utf-8', 'ignore')))
+            position = line_end + 1
+    return lines
+
+def read_batch(file_path, start, end):
+    # Relê exatamente um lote a partir dos offsets registrados
+    with open(file_path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return read_lines(mm, start, end)
+
+def count_lines(file_path, block_size=LINE_COUNT_BLOCK_SIZE):
+    # Conta quebras de linha em blocos do mmap, sem decodificar o texto;
+    # blocos menores liberam o GIL com frequência quando roda em paralelo ao treinamento
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            lines = sum(mm[start:start + block_size].count(b'\n') for start in range(0, size, block_size))
+            # Última linha sem '\n' final também é um documento
+            if mm[size - 1] != ord('\n'):
+                lines += 1
+    return lines
@@ -0,0 +1,42 @@
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+
+class SparseCentroids:
+    """Centróides reduzidos às top_m entradas de maior magnitude, em CSR float32, para predict e
+    distâncias rápidas. A distância usa a norma completa de cada centróide e o produto interno com
+    a parte esparsificada: ||x||² - 2·x·c_m + ||c||²."""
+
+    def __init__(self, centers, top_m):
+        n_clusters, n_features = centers.shape
+        top_m = min(top_m, n_features)
+        indptr = np.arange(n_clusters + 1, dtype=np.int64) * top_m
+        indices = np.empty(n_clusters * top_m, dtype=np.int32)
+        data = np.empty(n_clusters * top_m, dtype=np.float32)
+        self.squared_norms = np.empty(n_clusters, dtype=np.float64)
+        # Linha a linha, para não criar matrizes temporárias do tamanho de todos os centróides
+        for row in range(n_clusters):
+            center = np.asarray(centers[row], dtype=np.float32)
+            columns = np.sort(np.argpartition(-np.abs(center), top_m - 1)[:top_m]) if top_m < n_features \
+                else np.arange(n_features)
+            indices[row * top_m:(row + 1) * top_m] = columns
+            data[row * top_m:(row + 1) * top_m] = center[columns]
+            self.squared_norms[row] = np.dot(center, center)
+        self.centers = csr_matrix((data, indices, indptr), shape=(n_clusters, n_features))
+        self.top_m = top_m
+
+    def squared_distances(self, X):
+        if issparse(X):
+            X = csr_matrix(X, dtype=np.float32)
+            dots = np.asarray((X @ self.centers.T).todense(), dtype=np.float64)
+            x_squared = np.asarray(X.multiply(X).sum(axis=1), dtype=np.float64)
+        else:
+            X = np.asarray(X, dtype=np.float32)
+            dots = np.asarray((self.centers @ X.T).T, dtype=np.float64)
+            x_squared = np.einsum('ij,ij->i', X, X, dtype=np.float64)[:, None]
+        return np.maximum(x_squared - 2 * dots + self.squared_norms, 0)
+
+    def transform(self, X):
+        return np.sqrt(self.squared_distances(X))
+
+    def predict(self, X):
+        return np.argmin(self.squared_distances(X), axis=1)
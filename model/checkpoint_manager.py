@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from .model_io import save_model_files
+
+CHECKPOINT_DIR = 'checkpoints'
+MANIFEST_FILE = 'manifest.json'
+LEGACY_CHECKPOINT_PATTERN = re.compile(r'content_ranker_checkpoint_(\d+)(\.joblib)?$')
+
+def read_manifest(directory=CHECKPOINT_DIR):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'checkpoints': []}
+
+def has_checkpoint(directory=CHECKPOINT_DIR):
+    # Verificação estática: lê só o manifesto (e procura checkpoints antigos no diretório atual),
+    # sem instanciar o modelo, importar o sklearn nem abrir o banco
+    return bool(read_manifest(directory)['checkpoints']) or \
+        any(LEGACY_CHECKPOINT_PATTERN.match(name) for name in os.listdir('.'))
+
+class CheckpointManager:
+    """Grava checkpoints em segundo plano, mantém um manifesto e aplica a retenção."""
+
+    def __init__(self, directory=CHECKPOINT_DIR, max_checkpoints=3, compress=False):
+        self.directory = directory
+        self.max_checkpoints = max_checkpoints
+        # Matrizes em .npz comprimido: checkpoints bem menores, ao custo de CPU na gravação
+        self.compress = compress
+        self._queue = queue.Queue(maxsize=1)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def list_checkpoints(self):
+        # Caminhos do mais recente para o mais antigo; checkpoints antigos no diretório atual entram por último
+        entries = sorted(read_manifest(self.directory)['checkpoints'], key=lambda entry: entry['number'], reverse=True)
+        paths = [os.path.join(self.directory, entry['name']) for entry in entries]
+        return paths + self.legacy_checkpoints()
+
+    def legacy_checkpoints(self):
+        checkpoints = [(int(match.group(1)), name) for name in os.listdir('.')
+                       if (match := LEGACY_CHECKPOINT_PATTERN.match(name))]
+        return [name for _, name in sorted(checkpoints, reverse=True)]
+
+    def has_checkpoint(self):
+        return bool(self.list_checkpoints())
+
+    def save(self, number, header, arrays):
+        name = f'checkpoint_{number}'
+        os.makedirs(self.directory, exist_ok=True)
+        save_model_files(os.path.join(self.directory, name), header, arrays, compress=self.compress)
+        with self._lock:
+            manifest = read_manifest(self.directory)
+            entries = [entry for entry in manifest['checkpoints'] if entry['name'] != name]
+            entries.append({
+                'name': name,
+                'number': number,
+                'documents': header.get('state', {}).get('processed_documents_count', 0),
+                'created_at': time.time()
+            })
+            entries.sort(key=lambda entry: entry['number'])
+            expired = entries[:-self.max_checkpoints] if self.max_checkpoints > 0 else []
+            manifest['checkpoints'] = entries[len(expired):]
+            self.write_manifest(manifest)
+        # O manifesto é atualizado antes de apagar, então nunca aponta para um checkpoint removido
+        for entry in expired:
+            shutil.rmtree(os.path.join(self.directory, entry['name']), ignore_errors=True)
+            logging.info(f"Checkpoint antigo removido: {entry['name']}")
+
+    def write_manifest(self, manifest):
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        temp_path = f'{path}.temp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(temp_path, path)
+
+    def save_async(self, number, header, arrays):
+        # Cópia dos centróides no momento do checkpoint; o treinamento segue alterando os originais.
+        # Se ainda houver uma gravação pendente, espera por ela (no máximo um snapshot na fila).
+        snapshot = {name: np.array(array, copy=True) for name, array in arrays.items()}
+        self._ensure_writer()
+        self._queue.put((number, header, snapshot))
+
+    def wait(self):
+        self._queue.join()
+
+    def _ensure_writer(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._writer, name='checkpoint-writer', daemon=True)
+            self._thread.start()
+
+    def _writer(self):
+        while True:
+            number, header, arrays = self._queue.get()
+            try:
+                self.save(number, header, arrays)
+                print(f"\nCheckpoint {number} salvo. Total de documentos processados: "
+                      f"{header.get('state', {}).get('processed_documents_count', 0)}")
+            except Exception as e:
+                logging.error(f"Erro ao salvar checkpoint {number}: {str(e)}")
+            finally:
+                self._queue.task_done()
@@ -1,59 +1,268 @@
 import numpy as np
-from joblib import load
 import logging
 from sklearn.feature_extraction.text import HashingVectorizer
 from sklearn.cluster import MiniBatchKMeans
-from joblib import dump, load
-import nltk
-from nltk.tokenize import word_tokenize
 import os
 import mmap
-import psutil
+import signal
+import threading
 import time
-import sqlite3
+from collections import deque, namedtuple
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from .batch_reader import count_lines, iter_batch_offsets, read_lines
+from .centroids import SparseCentroids
+from .checkpoint_manager import CHECKPOINT_DIR, CheckpointManager
 from .dataset_cleaner import clean_and_verify_dataset
-from numba import jit
+from .deduplication import Deduplicator
+from .document_store import DB_PATH, DocumentStore
+from .embedding_store import EmbeddingStore
+from .feature_cache import FEATURE_CACHE_DIR, FEATURE_CACHE_MAX_MB, FeatureCache, cache_key
+from .inverted_index import frequent_feature_limit
+from .memory_governor import MemoryGovernor
+from .metrics import MetricsWriter, ProfileWindow, StageMetrics
+from .projection import DEFAULT_PROJECTION_DIM, Projection
+from .query_cache import QueryCache
+from .model_io import (build_kmeans, build_vectorizer, is_model_dir, kmeans_arrays, kmeans_config, kmeans_counts,
+                       load_model_files, save_model_files, set_kmeans_centers, vectorizer_config)
+from .scoring import CosineScorer
+from .tokenizers import DEFAULT_TOKENIZER, get_tokenizer
+from utils.file_hash import FileDigestCache, file_signature
 
-nltk.download('punkt', quiet=True)
+MODEL_PATH = 'content_ranker_model'
+# Hashes dos datasets já lidos, por tamanho e mtime, ao lado dos checkpoints
+FILE_DIGESTS_FILE = 'file_digests.json'
+# Versão do pré-processamento de documentos; incrementar ao mudar preprocess_text/process_batch
+# invalida as entradas do cache de features
+PREPROCESSING_VERSION = 1
 
-@jit(nopython=True)
-def fast_cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+def preprocess_text(text, tokenizer=DEFAULT_TOKENIZER):
+    return ' '.join(get_tokenizer(tokenizer)(text))
+
+def process_batch(batch, tokenizer=DEFAULT_TOKENIZER):
+    # batch: pares (offset, linha); descarta linhas vazias mantendo o offset de cada documento
+    tokenize = get_tokenizer(tokenizer)
+    offsets, documents = [], []
+    for offset, line in batch:
+        line = line.strip()
+        if line:
+            offsets.append(offset)
+            documents.append(' '.join(tokenize(line)))
+    return offsets, documents
+
+# Lote vetorizado: intervalo [start, end) no arquivo, offset de cada documento, textos, matriz CSR
+# e o tempo (segundos) de cada etapa da vetorização, medido onde ela rodou
+VectorizedBatch = namedtuple('VectorizedBatch', ['start', 'end', 'offsets', 'documents', 'X', 'timings'],
+                             defaults=(None,))
+
+def vectorize_lines(vectorizer, mm, start, end, tokenizer=DEFAULT_TOKENIZER):
+    started = time.perf_counter()
+    lines = read_lines(mm, start, end)
+    decoded = time.perf_counter()
+    offsets, documents = process_batch(lines, tokenizer)
+    tokenized = time.perf_counter()
+    X = vectorizer.transform(documents)
+    timings = {'decode': decoded - started, 'tokenize': tokenized - decoded, 'hash': time.perf_counter() - tokenized}
+    return VectorizedBatch(start, end, offsets, documents, X, timings)
+
+# Estado dos processos de treinamento paralelo (um vetorizador e um mmap por processo)
+_worker_vectorizer = None
+_worker_file = None
+_worker_tokenizer = DEFAULT_TOKENIZER
+
+def _init_worker(vectorizer_params, file_path, tokenizer=DEFAULT_TOKENIZER):
+    global _worker_vectorizer, _worker_file, _worker_tokenizer
+    # O Ctrl+C é tratado pelo processo principal via interrupt()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_vectorizer = HashingVectorizer(**vectorizer_params)
+    _worker_tokenizer = tokenizer
+    with open(file_path, 'rb') as file:
+        _worker_file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _vectorize_batch(start, end):
+    # Só os offsets atravessam a fronteira entre processos; o texto é lido do mmap local
+    return vectorize_lines(_worker_vectorizer, _worker_file, start, end, _worker_tokenizer)
 
 class ContentRanker:
-    def __init__(self, n_clusters=300, batch_size=100000, checkpoint_interval=10800, max_checkpoints=3):
-        self.vectorizer = HashingVectorizer(n_features=2**18, alternate_sign=False)
+    def __init__(self, n_clusters=300, batch_size=100000, checkpoint_interval=10800, max_checkpoints=3, n_probe=None,
+                 n_workers=1, checkpoint_dir=CHECKPOINT_DIR, db_path=DB_PATH, dedup='exact', cache_size=1024, cache_ttl=300,
+                 feature_cache_dir=FEATURE_CACHE_DIR, tokenizer=DEFAULT_TOKENIZER, metrics_file=None, metrics_interval=60,
+                 memory_budget_mb=None, projection=None, projection_dim=DEFAULT_PROJECTION_DIM, projection_rerank=20,
+                 compact_centroids=False, centroid_top_m=None, reassign_fraction=0.1,
+                 feature_cache_max_mb=FEATURE_CACHE_MAX_MB):
+        # Modo compacto: vetores e centróides em float32 e checkpoints comprimidos
+        self.compact_centroids = compact_centroids
+        dtype = np.float32 if compact_centroids else np.float64
+        self.vectorizer = HashingVectorizer(n_features=2**18, alternate_sign=False, dtype=dtype)
         self.kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, max_iter=200)
         self.file_path = None
+        self.file_hash = None
         self.file_size = 0
+        # Posição (em bytes) no arquivo até a qual os documentos já foram consumidos
+        self.current_offset = 0
+        # Estado de retomada lido do checkpoint: hash do arquivo e último id gravado no banco
+        self.checkpoint_file_hash = None
+        self.checkpoint_file_path = None
+        self.last_document_id = 0
         self.processed_documents_count = 0
+        # Documentos gravados desde a última reatribuição de clusters; a reatribuição (que percorre o
+        # banco inteiro) só roda no fim do treinamento quando eles passam de reassign_fraction do total
+        self.documents_since_reassign = 0
+        self.reassign_fraction = reassign_fraction
+        # Verdadeiro enquanto um modelo que começou sem centróides treina um arquivo: os documentos
+        # que já estão no banco (gravados por outro modelo) também entram no partial_fit
+        self.fit_stored_duplicates = False
         self.checkpoint_interval = checkpoint_interval
         self.last_checkpoint_time = time.time()
         self.batch_size = batch_size
         self.start_time = None
+        # Contagem exata de linhas do arquivo (0 enquanto desconhecida); o progresso usa bytes
         self.total_documents = 0
+        # Ponto de partida da execução atual, para calcular MB/s e docs/s
+        self.run_start_offset = 0
+        self.run_start_documents = 0
         self.checkpoint_count = 0
         self.max_checkpoints = max_checkpoints
+        self.checkpoints = CheckpointManager(checkpoint_dir, max_checkpoints, compress=compact_centroids)
+        self.file_digests = FileDigestCache(os.path.join(checkpoint_dir, FILE_DIGESTS_FILE))
+        # Com centroid_top_m, predict/transform usam só as top-m entradas de cada centróide (None = todas)
+        self.centroid_top_m = centroid_top_m
+        self._sparse_centroids = None
         self.interrupted = False
-        self.db_connection = sqlite3.connect('content_ranker.db')
+        # Número de clusters mais próximos consultados por query (None = busca exaustiva)
+        self.n_probe = n_probe
+        # Processos usados para tokenizar e vetorizar no treinamento (1 = sequencial)
+        self.n_workers = n_workers
+        # Deduplicação na ingestão: 'exact' (hash do conteúdo), 'near' (também MinHash/LSH) ou None
+        self.dedup = dedup
+        # Tokenizador usado nos documentos e nas queries: 'regex' (rápido) ou 'nltk' (word_tokenize)
+        get_tokenizer(tokenizer)
+        self.tokenizer = tokenizer
+        # Cache de consultas (LRU + TTL em segundos); model_version muda a cada alteração do índice
+        self.query_cache = QueryCache(cache_size, cache_ttl)
+        self.model_version = 0
+        # Lotes vetorizados em disco, reaproveitados ao retreinar o mesmo arquivo (None desativa),
+        # limitados a feature_cache_max_mb
+        self.feature_cache = FeatureCache(feature_cache_dir, feature_cache_max_mb) if feature_cache_dir else None
+        # Tempo por etapa do treinamento ('train.*') e das consultas ('query.*'); durante o
+        # treinamento um snapshot vai para metrics_file (JSON lines) a cada metrics_interval segundos
+        self.metrics = StageMetrics()
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        # Orçamento de RSS do treinamento (MB); o governador reduz/aumenta o lote efetivo para
+        # respeitá-lo e, sob pressão de memória, segura o próximo lote sem descartar documentos
+        self.memory_budget_mb = memory_budget_mb
+        self.memory_governor = MemoryGovernor(batch_size, memory_budget_mb)
+        # Projeção opcional ('random' ou 'svd') para projection_dim dimensões densas: o k-means passa a
+        # agrupar no espaço projetado e as consultas pontuam os embeddings float32 em mmap
+        self.projection = Projection(projection, projection_dim) if projection else None
+        # Candidatos por resultado reordenados pelo cosseno exato dos vetores esparsos (0 = só a projeção)
+        self.projection_rerank = projection_rerank
+        self.db_path = db_path
         self.create_database()
 
     def create_database(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('''CREATE TABLE IF NOT EXISTS documents
-                          (id INTEGER PRIMARY KEY, content TEXT)''')
-        self.db_connection.commit()
+        self._reader_stores = None
+        self.store = DocumentStore(self.db_path, self.vectorizer.n_features)
+        self.db_connection = self.store.connection
+        self.index = self.store.index
+        self.deduplicator = Deduplicator(self.store, self.dedup) if self.dedup else None
+        self.open_embeddings()
+        # Bancos criados antes do índice invertido têm documentos sem vetor, invisíveis para as consultas
+        if self.store.unindexed_documents(1):
+            logging.warning(f"O banco {self.db_path} tem documentos sem vetor; reindexando...")
+            self.rebuild_index()
+
+    def open_embeddings(self):
+        # Os embeddings acompanham as linhas do banco, em um diretório ao lado dele
+        self.embeddings = EmbeddingStore(f'{self.db_path}.embeddings', self.projection.n_components) \
+            if self.projection else None
+
+    def apply_compact_mode(self):
+        # Converte um modelo float64 (checkpoint antigo) para o modo compacto antes de treinar;
+        # partial_fit exige vetores e centróides com o mesmo dtype
+        self.checkpoints.compress = self.compact_centroids
+        if not self.compact_centroids:
+            return
+        if self.vectorizer.dtype != np.float32:
+            self.vectorizer.set_params(dtype=np.float32)
+        if self.has_centroids() and self.kmeans.cluster_centers_.dtype != np.float32:
+            set_kmeans_centers(self.kmeans, self.kmeans.cluster_centers_.astype(np.float32),
+                               kmeans_counts(self.kmeans).astype(np.float32))
+
+    def sparse_centroids(self):
+        # Refeito quando os centróides mudam (partial_fit os altera no lugar e avança n_steps_)
+        key = (id(self.kmeans.cluster_centers_), getattr(self.kmeans, 'n_steps_', 0))
+        sparse_centroids = self._sparse_centroids
+        if sparse_centroids is None or sparse_centroids[0] != key:
+            sparse_centroids = self._sparse_centroids = (key, SparseCentroids(self.kmeans.cluster_centers_,
+                                                                               self.centroid_top_m))
+        return sparse_centroids[1]
+
+    def predict_clusters(self, X):
+        if self.centroid_top_m:
+            return self.sparse_centroids().predict(X)
+        return self.kmeans.predict(X.astype(self.kmeans.cluster_centers_.dtype))
+
+    def cluster_distances(self, X):
+        if self.centroid_top_m:
+            return self.sparse_centroids().transform(X)
+        return self.kmeans.transform(X.astype(self.kmeans.cluster_centers_.dtype))
+
+    def cluster_features(self, X):
+        # Com projeção, os centróides vivem no espaço projetado
+        if self.projection and self.projection.is_fitted():
+            return self.projection.transform(X)
+        return X
+
+    def enable_concurrent_queries(self):
+        # A partir daqui as consultas de cada thread usam uma conexão própria, somente leitura
+        # (conexões sqlite3 não podem ser compartilhadas entre threads)
+        self._reader_stores = threading.local()
+        self._reader_stores_open = []
+        self._reader_stores_lock = threading.Lock()
+
+    def reader(self):
+        if self._reader_stores is None:
+            return self.store
+        store = getattr(self._reader_stores, 'store', None)
+        if store is None:
+            store = DocumentStore(self.db_path, self.vectorizer.n_features, read_only=True)
+            self._reader_stores.store = store
+            with self._reader_stores_lock:
+                self._reader_stores_open.append(store)
+        return store
+
+    def close_readers(self):
+        if self._reader_stores is None:
+            return
+        with self._reader_stores_lock:
+            for store in self._reader_stores_open:
+                store.close()
+            self._reader_stores_open = []
+        self._reader_stores = None
 
     def is_trained(self):
-        return self.processed_documents_count > 0
+        # Treinado = tem centróides e documentos indexados no banco para responder
+        return self.has_centroids() and self.reader().has_indexed_documents()
+
+    def has_centroids(self):
+        return hasattr(self.kmeans, 'cluster_centers_')
 
     def check_dataset(self, file_path):
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"O arquivo de dataset '{file_path}' não foi encontrado.")
         return True
 
+    def list_checkpoints(self):
+        return self.checkpoints.list_checkpoints()
+
     def has_checkpoint(self):
-        return any(f.startswith('content_ranker_checkpoint_') and f.endswith('.joblib') for f in os.listdir('.'))
+        return self.checkpoints.has_checkpoint()
+
+    def invalidate_query_cache(self):
+        self.model_version += 1
+        self.query_cache.clear()
 
     def clear_memory(self):
         import gc
@@ -64,47 +273,95 @@ class ContentRanker:
                f"Documentos processados: {self.processed_documents_count}"
 
     def preprocess_text(self, text):
-        return ' '.join(word.lower() for word in word_tokenize(text) if word.isalnum())
+        return preprocess_text(text, self.tokenizer)
 
     def process_batch(self, batch):
-        return [self.preprocess_text(line.strip()) for line in batch if line.strip()]
+        return process_batch(batch, self.tokenizer)
 
-    def process_in_batches(self, mm, batch_size=100000):
-        current_pos = 0
+    def vectorize_batch(self, mm, start, end):
+        return vectorize_lines(self.vectorizer, mm, start, end, self.tokenizer)
+
+    def vectorize_in_parallel(self, batches, n_workers):
+        # Pipeline: o leitor alimenta o pool, os processos tokenizam e vetorizam,
+        # e o consumidor recebe os lotes na ordem original do arquivo
+        executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                       initargs=(self.vectorizer.get_params(), self.file_path, self.tokenizer))
+        pending = deque()
         try:
-            while current_pos < self.file_size:
-                mm.seek(current_pos)
-                raw_batch = mm.read(batch_size * 100)
-                try:
-                    batch = raw_batch.decode('utf-8', errors='ignore').splitlines()
-                    if batch:
-                        yield batch
-                        current_pos = mm.tell()
-                    else:
-                        break
-                except Exception as e:
-                    logging.error(f"Erro ao processar batch na posição {current_pos}: {str(e)}")
-                    current_pos = mm.tell()
+            for start, end in batches:
+                if self.interrupted:
+                    break
+                pending.append(executor.submit(_vectorize_batch, start, end))
+                # Backpressure: sob pressão de memória só um lote fica em voo além do consumido
+                while len(pending) >= 2 * n_workers or (len(pending) > 1 and self.memory_governor.under_pressure()):
+                    yield pending.popleft().result()
+            while pending and not self.interrupted:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def preprocessing_config(self):
+        return {'preprocessing_version': PREPROCESSING_VERSION, 'tokenizer': self.tokenizer,
+                'vectorizer': vectorizer_config(self.vectorizer)}
+
+    def cached_batches(self, key, start=0):
+        batches = self.feature_cache.iter_batches(key, self.memory_governor.batch_size, start)
+        for start, end, offsets, documents, X in batches:
+            if self.interrupted:
+                break
+            yield VectorizedBatch(start, end, offsets, documents, X)
+
+    def record_batches(self, batches, writer):
+        # Repassa os lotes ao treinamento gravando cada um no cache de features
+        try:
+            for batch in batches:
+                writer.write(batch.start, batch.end, batch.offsets, batch.documents, batch.X)
+                yield batch
+        finally:
+            batches.close()
+
+    def process_in_batches(self, mm, batch_size=None, start=0):
+        batch_size = self.batch_size if batch_size is None else batch_size
+        try:
+            yield from iter_batch_offsets(mm, batch_size, start)
         except GeneratorExit:
             logging.info("Gerador fechado antecipadamente.")
         finally:
             logging.info("Finalizando processamento em lotes.")
 
-    def check_resources(self):
-        mem = psutil.virtual_memory()
-        if mem.percent > 90:
-            print("\nMemória muito alta (>90%). Pausando o treinamento por 60 segundos.")
-            time.sleep(60)
-            return False
-        return True
+    def training_metrics(self):
+        snapshot = self.metrics.snapshot('train.')
+        elapsed_time = time.time() - self.start_time if self.start_time else 0
+        run_documents = self.processed_documents_count - self.run_start_documents
+        snapshot.update(
+            documents_processed=self.processed_documents_count,
+            offset=self.current_offset,
+            progress=self.progress(),
+            elapsed_seconds=elapsed_time,
+            docs_per_second=run_documents / elapsed_time if elapsed_time > 0 else 0.0,
+            memory=self.memory_governor.snapshot()
+        )
+        return snapshot
 
-    def train(self, file_path, clean=False):
+    def train(self, file_path, clean=False, n_workers=None, count_lines=False, profile=None, profile_start=0,
+              profile_batches=20):
+        # profile: 'cprofile' ou 'tracemalloc' perfila os lotes [profile_start, profile_start + profile_batches)
         self.interrupted = False
+        n_workers = self.n_workers if n_workers is None else n_workers
         mm = None
+        feature_writer = None
+        self.metrics.reset('train.')
+        metrics_writer = MetricsWriter(self.metrics_file, self.metrics_interval) if self.metrics_file else None
+        profiler = ProfileWindow(profile, profile_start, profile_batches) if profile else None
         training_outcome = {
             "result": None,
             "documents_processed": 0,
-            "total_documents": 0
+            "total_documents": 0,
+            "progress": 0.0,
+            "duplicates_skipped": 0,
+            "near_duplicates_skipped": 0,
+            "metrics": None,
+            "profile": None
         }
         
         try:
@@ -112,9 +369,20 @@ class ContentRanker:
             self.check_dataset(file_path)
             clean_file_path = file_path + '.clean'
 
-            if clean:
+            clean_entry = self.file_digests.entry(clean_file_path) if clean else None
+            if clean_entry and clean_entry.get('source') == file_signature(file_path):
+                # A cópia verificada já corresponde ao dataset atual: não precisa ler e gravar de novo
+                logging.info("Dataset limpo já está atualizado. Usando dataset limpo existente...")
+                self.file_path = clean_file_path
+            elif clean:
                 logging.info("Limpando e verificando o dataset...")
-                self.file_path = clean_and_verify_dataset(file_path, clean_file_path)
+                cleaning_outcome = clean_and_verify_dataset(file_path, clean_file_path)
+                if not cleaning_outcome["success"]:
+                    raise RuntimeError(f"Falha ao limpar o dataset: {cleaning_outcome['error']}")
+                self.file_path = cleaning_outcome["output_file"]
+                self.file_digests.store(self.file_path, cleaning_outcome["output_hash"],
+                                        source=file_signature(file_path))
+                training_outcome["cleaning_mb_per_second"] = cleaning_outcome["mb_per_second"]
             else:
                 if os.path.exists(clean_file_path):
                     logging.info("Usando dataset limpo existente...")
@@ -125,48 +393,186 @@ class ContentRanker:
 
             self.file_size = os.path.getsize(self.file_path)
             logging.info(f"Tamanho do arquivo: {self.file_size} bytes")
-            
-            self.total_documents = sum(1 for _ in open(self.file_path, 'r', encoding='utf-8'))
-            training_outcome["total_documents"] = self.total_documents
-            logging.info(f"Total de documentos: {self.total_documents}")
+            # Lido do cache enquanto o tamanho e o mtime do arquivo não mudam
+            self.file_hash = self.file_digests.digest(self.file_path)
 
             checkpoint_loaded = self.load_checkpoint()
+            start_offset = 0
             if not checkpoint_loaded:
                 logging.info("Iniciando novo treinamento")
                 self.start_time = time.time()
                 self.processed_documents_count = 0
+                self.fit_stored_duplicates = not self.has_centroids()
+            elif self.checkpoint_file_hash == self.file_hash:
+                start_offset = self.current_offset
+                self.discard_documents_after(self.last_document_id, self.checkpoint_file_path or self.file_path)
+                logging.info(f"Retomando treinamento no byte {start_offset}. "
+                             f"Documentos já processados: {self.processed_documents_count}")
             else:
-                logging.info(f"Retomando treinamento. Documentos já processados: {self.processed_documents_count}")
+                logging.info(f"Checkpoint carregado de outro arquivo. Documentos já processados: "
+                             f"{self.processed_documents_count}")
+                self.fit_stored_duplicates = not self.has_centroids()
+            self.current_offset = start_offset
+            training_outcome["documents_processed"] = self.processed_documents_count
+
+            # O total vem da estimativa por bytes; a contagem exata é opcional e roda em paralelo
+            self.total_documents = 0
+            if count_lines:
+                self.start_line_count(self.file_path)
 
             self.start_time = time.time()
+            self.run_start_offset = start_offset
+            self.run_start_documents = self.processed_documents_count
             self.last_checkpoint_time = time.time()
+            self.ensure_writable_centroids()
+            if self.projection and self.has_centroids() and \
+                    self.kmeans.cluster_centers_.shape[1] != self.projection.n_components:
+                raise ValueError("O modelo existente foi treinado sem projeção; treine um modelo novo para usá-la.")
+            self.apply_compact_mode()
+            self.memory_governor = MemoryGovernor(self.batch_size, self.memory_budget_mb)
 
+            feature_key = cache_key(self.file_hash, self.preprocessing_config()) if self.feature_cache else None
+            inline_vectorization = False
             with open(self.file_path, 'rb') as file:
                 mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
-                for raw_batch in self.process_in_batches(mm, self.batch_size):
-                    if self.interrupted:
-                        logging.info("Treinamento interrompido pelo usuário.")
-                        training_outcome["result"] = "interrupted"
-                        break
-
-                    if not self.check_resources():
-                        continue
-
-                    processed_batch = self.process_batch(raw_batch)
-                    X = self.vectorizer.transform(processed_batch)
-                    self.kmeans.partial_fit(X)
-                    
-                    self.save_documents_to_db(processed_batch)
-                    self.processed_documents_count += len(processed_batch)
-                    training_outcome["documents_processed"] = self.processed_documents_count
-                    self.print_progress()
-
-                    if time.time() - self.last_checkpoint_time >= self.checkpoint_interval:
-                        self.save_checkpoint()
-
-            if not self.interrupted:
+                if feature_key and self.feature_cache.has(feature_key):
+                    logging.info("Usando lotes pré-processados do cache de features.")
+                    vectorized_batches = self.cached_batches(feature_key, start_offset)
+                else:
+                    batches = self.process_in_batches(mm, self.memory_governor.batch_size, start_offset)
+                    if n_workers > 1:
+                        logging.info(f"Treinamento paralelo com {n_workers} processos.")
+                        vectorized_batches = self.vectorize_in_parallel(batches, n_workers)
+                    else:
+                        vectorized_batches = (self.vectorize_batch(mm, start, end) for start, end in batches)
+                        inline_vectorization = True
+                    # Só uma passada completa desde o início do arquivo vira entrada do cache
+                    if feature_key and start_offset == 0:
+                        feature_writer = self.feature_cache.writer(
+                            feature_key, {'file_hash': self.file_hash, 'config': self.preprocessing_config(),
+                                          'source': os.path.abspath(self.file_path)})
+                        vectorized_batches = self.record_batches(vectorized_batches, feature_writer)
+
+                try:
+                    batch_index = 0
+                    waiting = time.perf_counter()
+                    for batch in vectorized_batches:
+                        # Tempo bloqueado esperando o próximo lote (pool de processos, cache de features),
+                        # descontada a vetorização feita neste processo, que já entra em decode/tokenize/hash
+                        waited = time.perf_counter() - waiting
+                        if inline_vectorization and batch.timings:
+                            waited = max(0.0, waited - sum(batch.timings.values()))
+                        self.metrics.add('train.wait_batch', waited)
+                        if self.interrupted:
+                            logging.info("Treinamento interrompido pelo usuário.")
+                            training_outcome["result"] = "interrupted"
+                            break
+                        if profiler:
+                            profiler.step(batch_index)
+                        batch_index += 1
+                        for stage, seconds in (batch.timings or {}).items():
+                            self.metrics.add('train.' + stage, seconds, len(batch.documents))
+
+                        # O lote já lido é sempre treinado; a pressão de memória só atrasa o próximo
+                        with self.metrics.timer('train.memory_wait'):
+                            self.memory_governor.wait_for_memory()
+
+                        documents, X, offsets = batch.documents, batch.X, batch.offsets
+                        band_keys = None
+                        # Linhas do lote treinado que são gravadas no banco (None = todas)
+                        stored_rows = None
+                        if self.deduplicator:
+                            with self.metrics.timer('train.dedup', len(documents)):
+                                if self.fit_stored_duplicates:
+                                    # Modelo sem centróides sobre um banco já povoado: o partial_fit vê também
+                                    # os documentos que já estão no banco; a deduplicação contra o banco
+                                    # vale só para a gravação
+                                    keep, duplicates, near_duplicates, _ = \
+                                        self.deduplicator.filter(documents, X, against_store=False)
+                                else:
+                                    keep, duplicates, near_duplicates, band_keys = \
+                                        self.deduplicator.filter(documents, X)
+                                if len(keep) < len(documents):
+                                    documents = [documents[i] for i in keep]
+                                    offsets = [offsets[i] for i in keep]
+                                    X = X[keep]
+                                if self.fit_stored_duplicates and documents:
+                                    stored_rows, stored_duplicates, stored_near_duplicates, band_keys = \
+                                        self.deduplicator.filter(documents, X)
+                                    duplicates += stored_duplicates
+                                    near_duplicates += stored_near_duplicates
+                            training_outcome["duplicates_skipped"] += duplicates
+                            training_outcome["near_duplicates_skipped"] += near_duplicates
+
+                        fitted_documents = len(documents)
+                        if documents:
+                            Z = None
+                            if self.projection:
+                                with self.metrics.timer('train.project', len(documents)):
+                                    if not self.projection.is_fitted():
+                                        self.projection.fit(X)
+                                    Z = self.projection.transform(X)
+                            with self.metrics.timer('train.partial_fit', len(documents)):
+                                self.kmeans.partial_fit(X if Z is None else Z)
+                            labels = self.kmeans.labels_
+                            if stored_rows is not None and len(stored_rows) < len(documents):
+                                documents = [documents[i] for i in stored_rows]
+                                offsets = [offsets[i] for i in stored_rows]
+                                X, labels = X[stored_rows], labels[stored_rows]
+                                Z = None if Z is None else Z[stored_rows]
+                        if documents:
+                            with self.metrics.timer('train.db_write', len(documents)):
+                                doc_ids = self.save_documents_to_db(documents, X, labels, offsets, Z)
+                                if self.deduplicator:
+                                    self.deduplicator.record(doc_ids, band_keys)
+                            self.last_document_id = doc_ids[-1]
+                        self.current_offset = batch.end
+                        self.processed_documents_count += fitted_documents
+                        self.documents_since_reassign += len(documents)
+                        self.metrics.count('train.batches')
+                        self.metrics.count('train.documents', fitted_documents)
+                        self.memory_governor.observe()
+                        training_outcome["documents_processed"] = self.processed_documents_count
+                        self.print_progress()
+
+                        if time.time() - self.last_checkpoint_time >= self.checkpoint_interval:
+                            with self.metrics.timer('train.checkpoint'):
+                                self.save_checkpoint()
+                        if metrics_writer and metrics_writer.due():
+                            metrics_writer.write(self.training_metrics())
+                        waiting = time.perf_counter()
+                finally:
+                    vectorized_batches.close()
+                    if profiler:
+                        training_outcome["profile"] = profiler.finish()
+
+            training_outcome["total_documents"] = self.total_documents or self.estimated_total_documents()
+            training_outcome["progress"] = self.progress()
+
+            if self.interrupted:
+                training_outcome["result"] = "interrupted"
+            else:
+                if feature_writer:
+                    feature_writer.commit()
+                    feature_writer = None
+                if self.reassign_due():
+                    logging.info("Reatribuindo clusters com os centróides finais...")
+                    with self.metrics.timer('train.reassign'):
+                        self.reassign_clusters()
+                elif self.documents_since_reassign:
+                    logging.info(f"Reatribuição de clusters adiada: {self.documents_since_reassign} documentos novos "
+                                 f"desde a última (reassign_clusters() força a reatribuição).")
                 logging.info("Treinamento completo. Salvando modelo final...")
-                self.save_model()
+                self.fit_stored_duplicates = False
+                # Checkpoint no fim do arquivo: treinar de novo o mesmo arquivo não duplica documentos
+                with self.metrics.timer('train.checkpoint'):
+                    self.save_checkpoint(wait=True)
+                if self.has_centroids():
+                    with self.metrics.timer('train.save_model'):
+                        self.save_model()
+                else:
+                    # Não sobrescreve um modelo salvo com um modelo vazio
+                    logging.warning("Nenhum documento treinado; o modelo final não foi salvo.")
                 training_outcome["result"] = "completed"
             
             self.clear_memory()
@@ -180,6 +586,12 @@ class ContentRanker:
         finally:
             if mm:
                 mm.close()
+            if feature_writer:
+                feature_writer.abort()
+            self.checkpoints.wait()
+            training_outcome["metrics"] = self.training_metrics()
+            if metrics_writer:
+                metrics_writer.write(training_outcome["metrics"])
 
         return training_outcome
 
@@ -187,10 +599,110 @@ class ContentRanker:
         self.interrupted = True
         logging.info("Sinal de interrupção recebido.")
 
-    def save_documents_to_db(self, documents):
-        cursor = self.db_connection.cursor()
-        cursor.executemany("INSERT INTO documents (content) VALUES (?)", [(doc,) for doc in documents])
-        self.db_connection.commit()
+    def save_documents_to_db(self, documents, X=None, clusters=None, offsets=None, Z=None):
+        if X is None:
+            X = self.vectorizer.transform(documents)
+        if Z is None and self.projection and self.projection.is_fitted():
+            Z = self.projection.transform(X)
+        if clusters is None and self.has_centroids():
+            clusters = self.predict_clusters(X if Z is None else Z)
+        doc_ids = self.store.add_documents(documents, X, clusters, source=self.file_path, offsets=offsets)
+        if Z is not None:
+            self.embeddings.add(doc_ids, Z, clusters)
+        self.invalidate_query_cache()
+        return doc_ids
+
+    def discard_documents_after(self, last_document_id, source=None):
+        # Remove os documentos do arquivo do checkpoint gravados depois dele, que serão reprocessados
+        # na retomada; documentos de outros arquivos treinados nesse meio-tempo são mantidos
+        doc_ids = self.store.discard_after(last_document_id, source)
+        if not doc_ids:
+            return 0
+        if self.deduplicator:
+            self.deduplicator.discard(doc_ids)
+        if self.embeddings is not None:
+            self.embeddings.discard(doc_ids)
+        self.invalidate_query_cache()
+        logging.warning(f"Descartados {len(doc_ids)} documentos de {source} gravados após o checkpoint; "
+                        f"eles serão reprocessados.")
+        return len(doc_ids)
+
+    def rebuild_index(self, batch_size=10000):
+        # Indexa documentos gravados antes do índice invertido existir
+        indexed = 0
+        while True:
+            rows = self.store.unindexed_documents(batch_size)
+            if not rows:
+                break
+            documents = [content for _, content in rows]
+            self.store.set_vectors([doc_id for doc_id, _ in rows], documents, self.vectorizer.transform(documents))
+            indexed += len(rows)
+            print(f"\rIndexados {indexed} documentos...", end="", flush=True)
+        self.invalidate_query_cache()
+        logging.info(f"Reindexação concluída. Documentos indexados: {indexed}")
+        return indexed
+
+    def rebuild_embeddings(self, batch_size=10000):
+        # Reprojeta todos os documentos do banco (por exemplo, gravados antes da projeção ser ajustada)
+        self.embeddings.clear()
+        for doc_ids, X in self.store.iter_vectors(batch_size):
+            Z = self.projection.transform(X)
+            self.embeddings.add(doc_ids, Z, self.predict_clusters(Z) if self.has_centroids() else None)
+        self.invalidate_query_cache()
+        logging.info(f"Embeddings reconstruídos para {len(self.embeddings)} documentos.")
+
+    def reassign_due(self):
+        # Sem documentos novos os centróides não mudaram; poucos documentos novos mudam pouco os centróides
+        return self.documents_since_reassign > 0 and \
+            self.documents_since_reassign >= self.reassign_fraction * self.store.count()
+
+    def reassign_clusters(self, batch_size=10000):
+        # Recalcula o cluster de cada documento com os centróides atuais
+        if not self.has_centroids():
+            return 0
+        reassigned = 0
+        if self.embeddings is not None and self.projection.is_fitted():
+            # No espaço projetado o predict lê os embeddings em mmap, sem decodificar os vetores esparsos
+            if len(self.embeddings) != self.store.count():
+                self.rebuild_embeddings(batch_size)
+            for start, Z, doc_ids, _ in self.embeddings.iter_chunks(batch_size):
+                clusters = self.predict_clusters(np.asarray(Z))
+                self.store.update_clusters(doc_ids.tolist(), clusters)
+                self.embeddings.update_clusters(start, clusters)
+                reassigned += len(doc_ids)
+        else:
+            for doc_ids, X in self.store.iter_vectors(batch_size):
+                self.store.update_clusters(doc_ids, self.predict_clusters(X))
+                reassigned += len(doc_ids)
+        self.documents_since_reassign = 0
+        self.invalidate_query_cache()
+        logging.info(f"Clusters reatribuídos para {reassigned} documentos.")
+        return reassigned
+
+    def start_line_count(self, file_path):
+        def run():
+            try:
+                self.total_documents = count_lines(file_path)
+                logging.info(f"Total de linhas no arquivo: {self.total_documents}")
+            except OSError as e:
+                logging.warning(f"Não foi possível contar as linhas do arquivo: {e}")
+
+        thread = threading.Thread(target=run, name='line-counter', daemon=True)
+        thread.start()
+        return thread
+
+    def progress(self):
+        # Percentual do arquivo já consumido, em bytes
+        if self.file_size <= 0:
+            return 0.0
+        return min(100.0, self.current_offset / self.file_size * 100)
+
+    def estimated_total_documents(self):
+        # Extrapola a densidade de documentos por byte observada até agora para o arquivo inteiro
+        if self.current_offset <= 0:
+            return self.processed_documents_count
+        return max(self.processed_documents_count,
+                   round(self.processed_documents_count * self.file_size / self.current_offset))
 
     def print_progress(self):
         if self.start_time is None:
@@ -198,51 +710,126 @@ class ContentRanker:
 
         elapsed_time = time.time() - self.start_time
         processed_documents = self.processed_documents_count
+        run_bytes = self.current_offset - self.run_start_offset
+        run_documents = processed_documents - self.run_start_documents
+        bytes_per_second = run_bytes / elapsed_time if elapsed_time > 0 else 0
+        documents_per_second = run_documents / elapsed_time if elapsed_time > 0 else 0
+        throughput = f"{bytes_per_second / 1e6:.2f} MB/s, {documents_per_second:.0f} docs/s"
 
-        if self.total_documents > 0:
-            progress = (processed_documents / self.total_documents) * 100
-            documents_per_second = processed_documents / elapsed_time if elapsed_time > 0 else 0
-            estimated_total_time = self.total_documents / documents_per_second if documents_per_second > 0 else 0
-            remaining_time = max(0, estimated_total_time - elapsed_time)
-
+        if self.file_size > 0:
+            remaining_bytes = max(0, self.file_size - self.current_offset)
+            remaining_time = remaining_bytes / bytes_per_second if bytes_per_second > 0 else 0
             hours, remainder = divmod(int(remaining_time), 3600)
             minutes, seconds = divmod(remainder, 60)
+            total = self.total_documents or f"~{self.estimated_total_documents()}"
 
-            print(f"\rProgresso: {progress:.2f}% ({processed_documents}/{self.total_documents} documentos). "
+            print(f"\rProgresso: {self.progress():.2f}% ({processed_documents}/{total} documentos, {throughput}). "
                 f"Tempo restante estimado: {hours:02d}:{minutes:02d}:{seconds:02d}", end="", flush=True)
         else:
-            print(f"\rProcessando documentos: {processed_documents}. Tempo decorrido: {elapsed_time:.2f}s", end="", flush=True)
+            print(f"\rProcessando documentos: {processed_documents} ({throughput}). "
+                  f"Tempo decorrido: {elapsed_time:.2f}s", end="", flush=True)
 
-    def save_checkpoint(self):
-        self.checkpoint_count += 1
-        checkpoint_filename = f'content_ranker_checkpoint_{self.checkpoint_count}.joblib'
-        temp_filename = f'{checkpoint_filename}.temp'
-        print(f"\nSalvando checkpoint {self.checkpoint_count}...")
-        try:
-            dump({
-                'kmeans': self.kmeans,
-                'vectorizer': self.vectorizer,
+    def model_header(self):
+        kmeans_params, kmeans_state = kmeans_config(self.kmeans)
+        return {
+            'vectorizer': vectorizer_config(self.vectorizer),
+            'kmeans': kmeans_params,
+            'kmeans_state': kmeans_state,
+            'projection': self.projection.config() if self.projection else None,
+            'state': {
                 'processed_documents_count': self.processed_documents_count,
                 'batch_size': self.batch_size,
                 'start_time': self.start_time,
                 'total_documents': self.total_documents,
-                'checkpoint_count': self.checkpoint_count
-            }, temp_filename)
-            os.replace(temp_filename, checkpoint_filename)
-            print(f"Checkpoint {self.checkpoint_count} salvo. Total de documentos processados: {self.processed_documents_count}")
+                'checkpoint_count': self.checkpoint_count,
+                'file_path': self.file_path,
+                'file_hash': self.file_hash,
+                'byte_offset': self.current_offset,
+                'last_document_id': self.last_document_id,
+                'documents_since_reassign': self.documents_since_reassign,
+                'fit_stored_duplicates': self.fit_stored_duplicates,
+                'n_probe': self.n_probe,
+                'n_workers': self.n_workers,
+                'db_path': self.db_path,
+                'dedup': self.dedup,
+                'cache_size': self.query_cache.max_size,
+                'cache_ttl': self.query_cache.ttl,
+                'tokenizer': self.tokenizer,
+                'projection_rerank': self.projection_rerank,
+                'compact_centroids': self.compact_centroids,
+                'centroid_top_m': self.centroid_top_m
+            }
+        }
+
+    def model_arrays(self):
+        arrays = self.projection.arrays() if self.projection else {}
+        arrays.update(kmeans_arrays(self.kmeans))
+        return arrays
+
+    def restore_state(self, state):
+        # Só o estado do treinamento; as configurações de execução passadas ao construtor
+        # (n_probe, n_workers, cache, batch_size...) não são sobrescritas pelo checkpoint
+        self.processed_documents_count = state.get('processed_documents_count', 0)
+        self.start_time = state.get('start_time') or time.time()
+        self.total_documents = state.get('total_documents', self.processed_documents_count)
+        self.checkpoint_count = state.get('checkpoint_count', 0)
+        self.checkpoint_file_hash = state.get('file_hash')
+        self.checkpoint_file_path = state.get('file_path')
+        self.current_offset = state.get('byte_offset', 0)
+        self.last_document_id = state.get('last_document_id', 0)
+        self.documents_since_reassign = state.get('documents_since_reassign', 0)
+        self.fit_stored_duplicates = state.get('fit_stored_duplicates', False)
+        # Modelos salvos antes da escolha de tokenizador foram indexados com o NLTK
+        self.tokenizer = state.get('tokenizer', 'nltk')
+        # O modo compacto pode ser ativado em um modelo existente (o train converte os centróides),
+        # mas não é desfeito ao carregar; o top-m pedido no construtor prevalece sobre o salvo
+        self.compact_centroids = self.compact_centroids or state.get('compact_centroids', False)
+        self.centroid_top_m = self.centroid_top_m or state.get('centroid_top_m')
+
+    def restore_settings(self, state):
+        # Configurações de execução salvas com o modelo; só valem ao carregar um modelo
+        # criado com os padrões (load_model, ou load_checkpoint(settings=True) na abertura do programa)
+        self.batch_size = state.get('batch_size', self.batch_size)
+        self.n_probe = state.get('n_probe', self.n_probe)
+        self.n_workers = state.get('n_workers', self.n_workers)
+        self.query_cache.max_size = state.get('cache_size', self.query_cache.max_size)
+        self.query_cache.ttl = state.get('cache_ttl', self.query_cache.ttl)
+        self.projection_rerank = state.get('projection_rerank', self.projection_rerank)
+
+    def restore_model(self, header, arrays, settings=False):
+        self.vectorizer = build_vectorizer(header['vectorizer'])
+        self.kmeans = build_kmeans(header['kmeans'], header.get('kmeans_state', {}), arrays)
+        self.store.n_features = self.vectorizer.n_features
+        # Modelos sem a chave 'projection' são anteriores a ela e mantêm a configuração atual
+        if 'projection' in header:
+            self.projection = Projection.restore(header['projection'], arrays) if header['projection'] else None
+            self.open_embeddings()
+        self.restore_state(header.get('state', {}))
+        if settings:
+            self.restore_settings(header.get('state', {}))
+        self.invalidate_query_cache()
+
+    def ensure_writable_centroids(self):
+        # Modelos carregados com mmap_mode='r' são somente leitura; o partial_fit atualiza os centróides no lugar
+        if self.has_centroids() and not self.kmeans.cluster_centers_.flags.writeable:
+            set_kmeans_centers(self.kmeans, np.array(self.kmeans.cluster_centers_),
+                               np.array(kmeans_counts(self.kmeans)))
+
+    def save_checkpoint(self, wait=False):
+        # A gravação acontece em uma thread separada a partir de uma cópia dos centróides
+        self.checkpoint_count += 1
+        print(f"\nSalvando checkpoint {self.checkpoint_count}...")
+        try:
+            self.checkpoints.save_async(self.checkpoint_count, self.model_header(), self.model_arrays())
+            if wait:
+                self.checkpoints.wait()
         except Exception as e:
             logging.error(f"Erro ao salvar checkpoint: {str(e)}")
-            if os.path.exists(temp_filename):
-                os.remove(temp_filename)
         finally:
             self.last_checkpoint_time = time.time()
 
-    def load_checkpoint(self):
-        checkpoints = sorted(
-            [f for f in os.listdir('.') if f.startswith('content_ranker_checkpoint_') and f.endswith('.joblib')],
-            key=lambda x: int(x.split('_')[-1].split('.')[0]),
-            reverse=True
-        )
+    def load_checkpoint(self, settings=False):
+        checkpoints = self.list_checkpoints()
         
         if not checkpoints:
             logging.info("Nenhum checkpoint encontrado.")
@@ -257,16 +844,17 @@ class ContentRanker:
                 continue
 
             try:
-                with open(checkpoint_file, 'rb') as f:
-                    checkpoint = load(f)
-                
-                self.kmeans = checkpoint['kmeans']
-                self.vectorizer = checkpoint['vectorizer']
-                self.processed_documents_count = checkpoint.get('processed_documents_count', 0)
-                self.batch_size = checkpoint.get('batch_size', self.batch_size)
-                self.start_time = checkpoint.get('start_time', time.time())
-                self.total_documents = checkpoint.get('total_documents', self.processed_documents_count)
-                self.checkpoint_count = checkpoint.get('checkpoint_count', 0)
+                if checkpoint_file.endswith('.joblib'):
+                    from joblib import load
+                    with open(checkpoint_file, 'rb') as f:
+                        checkpoint = load(f)
+                    self.kmeans = checkpoint['kmeans']
+                    self.vectorizer = checkpoint['vectorizer']
+                    self.restore_state(checkpoint)
+                    if settings:
+                        self.restore_settings(checkpoint)
+                else:
+                    self.restore_model(*load_model_files(checkpoint_file), settings=settings)
                 
                 logging.info(f"Checkpoint {self.checkpoint_count} carregado com sucesso. "
                             f"Documentos processados: {self.processed_documents_count}")
@@ -281,6 +869,11 @@ class ContentRanker:
         return False
     
     def verify_file_integrity(self, file_path):
+        if os.path.isdir(file_path):
+            if not is_model_dir(file_path):
+                logging.warning(f"Diretório {file_path} não contém um modelo válido.")
+                return False
+            return all(self.verify_file_integrity(os.path.join(file_path, name)) for name in os.listdir(file_path))
         try:
             file_size = os.path.getsize(file_path)
             if file_size == 0:
@@ -306,35 +899,123 @@ class ContentRanker:
             print(f"\rCarregado {i+len(batch)} documentos...", end="", flush=True)
         print("\nTodos os documentos foram carregados para o banco de dados.")
 
-    def save_model(self):
-        dump(self, 'content_ranker_model.joblib')
+    def save_model(self, path=MODEL_PATH):
+        save_model_files(path, self.model_header(), self.model_arrays())
 
-    def rank_content(self, query):
-        query_vec = self.vectorizer.transform([self.preprocess_text(query)]).toarray().flatten()
-        cluster = self.kmeans.predict(query_vec.reshape(1, -1))[0]
-        
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT id, content FROM documents ORDER BY RANDOM() LIMIT 1000")
-        documents = cursor.fetchall()
-        
-        similarities = []
-        for doc_id, doc_content in documents:
-            doc_vec = self.vectorizer.transform([doc_content]).toarray().flatten()
-            similarity = fast_cosine_similarity(query_vec, doc_vec)
-            similarities.append((doc_id, similarity))
-        
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return similarities[:5]
+    def rank_content(self, query, k=5, n_probe=None):
+        with self.metrics.timer('query.preprocess'):
+            processed_query = self.preprocess_text(query)
+        return self.rank_processed(processed_query, k, n_probe)
+
+    def rank_processed(self, processed_query, k=5, n_probe=None, count=True):
+        # rank_content para uma query já pré-processada; count=False não conta a consulta ao cache
+        n_probe = self.n_probe if n_probe is None else n_probe
+        # Queries que diferem só em pontuação/caixa compartilham a mesma entrada do cache
+        cache_key = ('rank', self.model_version, processed_query, k, n_probe)
+        ranked = self.query_cache.get(cache_key, count)
+        if ranked is None:
+            with self.metrics.timer('query.vectorize'):
+                query_vec = self.vectorizer.transform([processed_query])
+            with self.metrics.timer('query.rank'):
+                if self.has_embeddings():
+                    ranked = self.rank_projected(query_vec, k, n_probe)[0]
+                elif n_probe and self.has_centroids():
+                    ranked = self.rank_in_clusters(query_vec, k, n_probe)
+                else:
+                    reader = self.reader()
+                    ranked = reader.index.search(query_vec, k, frequent_feature_limit(reader.max_id()))
+            ranked = tuple(ranked)
+            self.query_cache.put(cache_key, ranked)
+        return list(ranked)
+
+    def rank_many(self, queries, k=5, n_probe=None, batch_size=1000):
+        # Avaliação em lote: vetoriza e pontua batch_size queries de uma vez e devolve,
+        # como gerador, a lista (doc_id, score) de cada query na ordem de entrada
+        n_probe = self.n_probe if n_probe is None else n_probe
+        queries = iter(queries)
+        while True:
+            batch = [self.preprocess_text(query) for query in islice(queries, batch_size)]
+            if not batch:
+                break
+            query_vecs = self.vectorizer.transform(batch)
+            if self.has_embeddings():
+                yield from self.rank_projected(query_vecs, k, n_probe)
+            elif n_probe and self.has_centroids():
+                yield from self.rank_many_in_clusters(query_vecs, k, n_probe)
+            else:
+                reader = self.reader()
+                yield from reader.index.search_many(query_vecs, k, frequent_feature_limit(reader.max_id()))
+
+    def has_embeddings(self):
+        return self.embeddings is not None and self.projection.is_fitted() and len(self.embeddings) > 0
+
+    def rank_projected(self, query_vecs, k, n_probe):
+        # Busca nos embeddings: exaustiva ou, com n_probe, só nos clusters mais próximos (IVF).
+        # Os k * projection_rerank melhores candidatos são reordenados pelo cosseno exato
+        Q = self.projection.transform(query_vecs)
+        probes = None
+        if n_probe and self.has_centroids():
+            distances = self.cluster_distances(Q)
+            n_probe = min(n_probe, distances.shape[1])
+            probes = list(np.argpartition(distances, n_probe - 1, axis=1)[:, :n_probe])
+        candidates = self.embeddings.search_many(Q, k * max(1, self.projection_rerank), probes)
+        if not self.projection_rerank:
+            return candidates
+        # Uma leitura dos vetores de todos os candidatos do lote, em ordem de id (empates saem como no
+        # índice invertido); cada query só pontua os próprios candidatos
+        doc_ids, X = self.reader().fetch_vectors(sorted({doc_id for results in candidates for doc_id, _ in results}))
+        if not doc_ids:
+            return [[] for _ in candidates]
+        positions = {doc_id: column for column, doc_id in enumerate(doc_ids)}
+        allowed_columns = [np.array([positions[doc_id] for doc_id, _ in results if doc_id in positions], dtype=np.int64)
+                           for results in candidates]
+        allowed = lambda row, columns: np.isin(columns, allowed_columns[row])
+        return CosineScorer(X, doc_ids, normalized=True).rank_many(query_vecs, k, allowed)
+
+    def rank_many_in_clusters(self, query_vecs, k, n_probe):
+        # Os candidatos são os documentos da união dos clusters sondados; cada query só
+        # pontua os dos seus próprios n_probe clusters, como em rank_in_clusters
+        distances = self.cluster_distances(self.cluster_features(query_vecs))
+        n_probe = min(n_probe, distances.shape[1])
+        probes = np.argpartition(distances, n_probe - 1, axis=1)[:, :n_probe]
+        doc_ids, X, clusters = self.reader().vectors_in_clusters(np.unique(probes).tolist(), with_clusters=True)
+        if not doc_ids:
+            return [[] for _ in range(query_vecs.shape[0])]
+        allowed = lambda row, columns: np.isin(clusters[columns], probes[row])
+        return CosineScorer(X, doc_ids, normalized=True).rank_many(query_vecs, k, allowed)
+
+    def answer_many(self, queries, k=5, batch_size=1000):
+        # Como answer_query para muitas perguntas: uma busca em lote e uma leitura dos
+        # documentos por lote, sem registrar cada resultado no log
+        if not self.is_trained():
+            raise RuntimeError("O modelo ainda não foi treinado.")
+        queries = iter(queries)
+        while True:
+            batch = list(islice(queries, batch_size))
+            if not batch:
+                break
+            ranked = list(self.rank_many(batch, k, batch_size=batch_size))
+            contents = self.reader().fetch_map(doc_id for results in ranked for doc_id, _ in results)
+            for query, results in zip(batch, ranked):
+                relevant_info = [contents[doc_id] for doc_id, _ in results if doc_id in contents]
+                yield self.generate_response(query, relevant_info)
+
+    def nearest_clusters(self, query_vec, n_probe):
+        distances = self.cluster_distances(self.cluster_features(query_vec))[0]
+        n_probe = min(n_probe, len(distances))
+        nearest = np.argpartition(distances, n_probe - 1)[:n_probe]
+        return nearest[np.argsort(distances[nearest])].tolist()
+
+    def rank_in_clusters(self, query_vec, k, n_probe):
+        # Busca podada: pontua apenas os documentos dos n_probe clusters mais próximos da query
+        doc_ids, X = self.reader().vectors_in_clusters(self.nearest_clusters(query_vec, n_probe))
+        if not doc_ids:
+            return []
+        return CosineScorer(X, doc_ids, normalized=True).rank(query_vec, k)
 
     def extract_relevant_info(self, query, ranked_indices):
-        cursor = self.db_connection.cursor()
-        relevant_info = []
-        for doc_id, _ in ranked_indices:
-            cursor.execute("SELECT content FROM documents WHERE id = ?", (doc_id,))
-            result = cursor.fetchone()
-            if result:
-                relevant_info.append(result[0])
-        return relevant_info
+        with self.metrics.timer('query.fetch', len(ranked_indices)):
+            return self.reader().fetch(doc_id for doc_id, _ in ranked_indices)
 
     def generate_response(self, query, relevant_info):
         if not relevant_info:
@@ -351,21 +1032,34 @@ class ContentRanker:
             logging.warning("Modelo não treinado. Retornando mensagem de erro.")
             return "O modelo ainda não foi treinado. Por favor, conclua o treinamento antes de fazer perguntas."
 
+        self.metrics.count('query.requests')
         try:
-            logging.info("Iniciando rank_content")
-            ranked_indices = self.rank_content(query)
-            logging.info(f"rank_content concluído. Resultados: {ranked_indices}")
+            with self.metrics.timer('query.preprocess'):
+                processed_query = self.preprocess_text(query)
+            cache_key = ('answer', self.model_version, processed_query, self.n_probe)
+            relevant_info = self.query_cache.get(cache_key)
+            if relevant_info is None:
+                self.metrics.count('query.cache_misses')
+                logging.info("Iniciando rank_content")
+                # A pergunta já foi contada no cache acima: a busca interna não conta de novo
+                ranked_indices = self.rank_processed(processed_query, count=False)
+                logging.info(f"rank_content concluído. Resultados: {ranked_indices}")
 
-            logging.info("Iniciando extract_relevant_info")
-            relevant_info = self.extract_relevant_info(query, ranked_indices)
-            logging.info(f"extract_relevant_info concluído. Informações relevantes: {relevant_info}")
+                logging.info("Iniciando extract_relevant_info")
+                relevant_info = tuple(self.extract_relevant_info(query, ranked_indices))
+                logging.info(f"extract_relevant_info concluído. Informações relevantes: {relevant_info}")
+                self.query_cache.put(cache_key, relevant_info)
+            else:
+                logging.info("Informações relevantes encontradas no cache de consultas")
 
             logging.info("Gerando resposta")
-            response = self.generate_response(query, relevant_info)
+            with self.metrics.timer('query.generate'):
+                response = self.generate_response(query, relevant_info)
             logging.info("Resposta gerada com sucesso")
 
             return response
         except Exception as e:
+            self.metrics.count('query.errors')
             logging.error(f"Erro ao processar query: {str(e)}")
             return f"Ocorreu um erro ao processar sua pergunta: {str(e)}"
 
@@ -373,12 +1067,16 @@ class ContentRanker:
         logging.info(f"Incrementando o modelo com novos dados de: {new_file_path}")
         increment_outcome = {
             "result": None,
-            "new_documents_processed": 0
+            "new_documents_processed": 0,
+            "duplicates_skipped": 0,
+            "near_duplicates_skipped": 0
         }
         
         try:
             initial_count = self.processed_documents_count
             training_outcome = self.train(new_file_path, clean=True)
+            increment_outcome["duplicates_skipped"] = training_outcome["duplicates_skipped"]
+            increment_outcome["near_duplicates_skipped"] = training_outcome["near_duplicates_skipped"]
             
             if training_outcome["result"] == "completed":
                 increment_outcome["new_documents_processed"] = training_outcome["documents_processed"] - initial_count
@@ -398,10 +1096,12 @@ class ContentRanker:
             return increment_outcome
 
     def __del__(self):
-        if hasattr(self, 'db_connection'):
-            self.db_connection.close()
+        if hasattr(self, 'store'):
+            self.store.close()
 
-def load_model(filename='content_ranker_model.joblib'):
-    model = load(filename)
-    model.db_connection = sqlite3.connect('content_ranker.db')
+def load_model(filename=MODEL_PATH, mmap_mode='r'):
+    header, arrays = load_model_files(filename, mmap_mode=mmap_mode)
+    state = header.get('state', {})
+    model = ContentRanker(db_path=state.get('db_path', DB_PATH), dedup=state.get('dedup', 'exact'))
+    model.restore_model(header, arrays, settings=True)
     return model
\ No newline at end of file
@@ -1,58 +1,188 @@
-import codecs
 import os
+import re
+import time
+import mmap
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from utils.file_hash import new_digest
 
-def clean_and_verify_dataset(input_file, output_file=None, clean=False):
+CHUNK_SIZE = 64 * 1024 * 1024
+# Bytes de entrada em voo (enviados aos processos e ainda não gravados); os textos decodificados
+# ocupam algumas vezes isso, então o limite vale para qualquer número de processos
+MAX_IN_FLIGHT_BYTES = 512 * 1024 * 1024
+
+# Sequências de caracteres fora do plano básico (emojis, ideogramas raros...)
+SUPPLEMENTARY_PATTERN = re.compile('[\U00010000-\U0010ffff]+')
+
+@lru_cache(maxsize=None)
+def unprintable_pattern():
+    # Mesma regra da versão por caractere: remove o que não for imprimível nem espaço em branco.
+    # A classe cobre só o plano básico (até U+FFFF), onde o re usa uma tabela de bits rápida;
+    # os raros caracteres suplementares são filtrados um a um em remove_unprintable.
+    ranges = []
+    start = None
+    for code_point in range(0x10001):
+        remove = code_point <= 0xffff and not (chr(code_point).isprintable() or chr(code_point).isspace())
+        if remove and start is None:
+            start = code_point
+        elif not remove and start is not None:
+            ranges.append(f'\\u{start:04x}-\\u{code_point - 1:04x}')
+            start = None
+    return re.compile(f"[{''.join(ranges)}]+")
+
+def keep_printable(match):
+    return ''.join(char for char in match.group() if char.isprintable() or char.isspace())
+
+def remove_unprintable(text):
+    text = unprintable_pattern().sub('', text)
+    if not text.isascii():
+        text = SUPPLEMENTARY_PATTERN.sub(keep_printable, text)
+    return text
+
+def chunk_offsets(mm, chunk_size=CHUNK_SIZE):
+    # Blocos de ~chunk_size bytes que terminam sempre logo após um '\n'
+    size = len(mm)
+    position = 0
+    while position < size:
+        newline = mm.find(b'\n', min(position + chunk_size, size) - 1)
+        end = size if newline == -1 else newline + 1
+        yield position, end
+        position = end
+
+def count_invalid_lines(data):
+    # Linhas com bytes UTF-8 inválidos; um caractere multibyte nunca contém '\n' ou '\r',
+    # então separar os bytes nessas quebras não corta caracteres
+    problematic_lines = 0
+    for line in data.splitlines():
+        try:
+            line.decode('utf-8')
+        except UnicodeDecodeError:
+            problematic_lines += 1
+    return problematic_lines
+
+def clean_chunk(input_file, start, end, clean):
+    with open(input_file, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    try:
+        text = data.decode('utf-8')
+        problematic_lines = 0
+    except UnicodeDecodeError:
+        # Bytes inválidos viram U+FFFD; as linhas afetadas são contadas como problemáticas
+        text = data.decode('utf-8', errors='replace')
+        problematic_lines = count_invalid_lines(data)
+
+    # splitlines segue as mesmas quebras de linha da leitura com codecs (\r, \x0b, \u2028...)
+    total_lines = len(text.splitlines())
+
+    if not clean:
+        return text.encode('utf-8'), total_lines, 0, problematic_lines
+
+    cleaned = [line.strip() for line in remove_unprintable(text).splitlines()]
+    cleaned = [line for line in cleaned if line]
+    output = '\n'.join(cleaned) + '\n' if cleaned else ''
+    return output.encode('utf-8'), total_lines, len(cleaned), problematic_lines
+
+def clean_and_verify_dataset(input_file, output_file=None, clean=False, n_workers=None, chunk_size=CHUNK_SIZE,
+                             max_in_flight_bytes=MAX_IN_FLIGHT_BYTES):
     if output_file is None:
         output_file = input_file + '.clean'
-    
+    # A verificação (clean=False) só copia o texto: um processo basta e evita serializar cada bloco
+    n_workers = (n_workers or os.cpu_count() or 1) if clean else 1
+    # Blocos menores com muitos processos, para todos terem trabalho dentro do limite de bytes em voo
+    chunk_size = max(1, min(chunk_size, max_in_flight_bytes // (2 * n_workers)))
+
     cleaning_outcome = {
         "success": False,
         "total_lines": 0,
         "problematic_lines": 0,
         "cleaned_lines": 0,
         "output_file": None,
+        # Hash do arquivo gerado, calculado durante a gravação (igual ao de file_digest)
+        "output_hash": None,
+        "bytes_processed": 0,
+        "elapsed_seconds": 0.0,
+        "mb_per_second": 0.0,
         "error": None
     }
-    
+
     logging.info(f"{'Limpando' if clean else 'Verificando'} o arquivo: {input_file}")
-    
+    temp_file = output_file + '.temp'
+    start_time = time.perf_counter()
+    digest = new_digest()
+
     try:
-        with codecs.open(input_file, 'r', encoding='utf-8', errors='replace') as infile, \
-             codecs.open(output_file, 'w', encoding='utf-8') as outfile:
-            for line_number, line in enumerate(infile, 1):
-                cleaning_outcome["total_lines"] += 1
-                try:
-                    if clean:
-                        clean_line = ''.join(char for char in line if char.isprintable() or char.isspace()).strip()
-                        if clean_line:
-                            outfile.write(clean_line + '\n')
-                            cleaning_outcome["cleaned_lines"] += 1
-                    else:
-                        outfile.write(line)
-                except Exception as e:
-                    cleaning_outcome["problematic_lines"] += 1
-                    logging.warning(f"Erro na linha {line_number}: {e}")
-                
-                if cleaning_outcome["total_lines"] % 100000 == 0:
-                    logging.info(f"Processadas {cleaning_outcome['total_lines']} linhas...")
-    
+        if clean:
+            # Compilado antes de criar o pool para os processos filhos herdarem o padrão pronto
+            unprintable_pattern()
+
+        with open(input_file, 'rb') as infile, open(temp_file, 'wb') as outfile:
+            input_size = os.fstat(infile.fileno()).st_size
+            def write_result(output, total_lines, cleaned_lines, problematic_lines):
+                outfile.write(output)
+                digest.update(output)
+                cleaning_outcome["total_lines"] += total_lines
+                cleaning_outcome["cleaned_lines"] += cleaned_lines
+                cleaning_outcome["problematic_lines"] += problematic_lines
+                logging.info(f"Processadas {cleaning_outcome['total_lines']} linhas...")
+
+            if input_size and n_workers == 1:
+                with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for start, end in chunk_offsets(mm, chunk_size):
+                        write_result(*clean_chunk(input_file, start, end, clean))
+            elif input_size:
+                with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                     ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    pending = deque()
+                    in_flight = 0
+
+                    def write_next():
+                        nonlocal in_flight
+                        future, size = pending.popleft()
+                        write_result(*future.result())
+                        in_flight -= size
+
+                    # Os blocos são limpos em paralelo e gravados na ordem original do arquivo
+                    for start, end in chunk_offsets(mm, chunk_size):
+                        while pending and in_flight + (end - start) > max_in_flight_bytes:
+                            write_next()
+                        pending.append((executor.submit(clean_chunk, input_file, start, end, clean), end - start))
+                        in_flight += end - start
+                    while pending:
+                        write_next()
+
+        cleaning_outcome["bytes_processed"] = input_size
+        cleaning_outcome["output_hash"] = digest.hexdigest()
+        cleaning_outcome["elapsed_seconds"] = time.perf_counter() - start_time
+        if cleaning_outcome["elapsed_seconds"] > 0:
+            cleaning_outcome["mb_per_second"] = input_size / cleaning_outcome["elapsed_seconds"] / 1e6
+
         if cleaning_outcome["problematic_lines"] == 0:
             logging.info(f"Dataset {'limpo e' if clean else ''} verificado com sucesso!")
             if clean:
-                os.replace(output_file, input_file)
+                os.replace(temp_file, input_file)
                 cleaning_outcome["output_file"] = input_file
             else:
+                os.replace(temp_file, output_file)
                 cleaning_outcome["output_file"] = output_file
             cleaning_outcome["success"] = True
         else:
+            # Com bytes inválidos o arquivo original é preservado e o resultado fica em output_file
+            logging.warning(f"{cleaning_outcome['problematic_lines']} linhas com bytes UTF-8 inválidos "
+                            f"(substituídos por U+FFFD).")
+            os.replace(temp_file, output_file)
             cleaning_outcome["output_file"] = output_file
             cleaning_outcome["success"] = True
             logging.info(f"Dataset {'limpo e' if clean else ''} salvo como: {output_file}")
-    
+        logging.info(f"Vazão da limpeza: {cleaning_outcome['mb_per_second']:.2f} MB/s")
+
     except Exception as e:
         logging.error(f"Erro ao processar o arquivo: {e}")
         cleaning_outcome["error"] = str(e)
         cleaning_outcome["success"] = False
-    
-    return cleaning_outcome
\ No newline at end of file
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return cleaning_outcome
@@ -0,0 +1,115 @@
+import numpy as np
+
+from .document_store import MAX_SQL_VARIABLES, content_hash
+
+# Primo acima de 2**32: (a * feature + b) cabe em int64 para features de até 2**31
+MINHASH_PRIME = 4294967311
+
+class Deduplicator:
+    """Deduplicação em streaming antes do partial_fit e da gravação no banco.
+
+    mode='exact' descarta documentos com o mesmo hash de conteúdo (no lote ou já no banco);
+    mode='near' também descarta quase-duplicados via MinHash/LSH sobre os ids de features do vetor.
+    """
+
+    def __init__(self, store, mode='exact', num_perm=64, bands=8, seed=1):
+        if mode not in ('exact', 'near'):
+            raise ValueError(f"Modo de deduplicação desconhecido: {mode}")
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands.")
+        self.store = store
+        self.mode = mode
+        self.bands = bands
+        rng = np.random.default_rng(seed)
+        self.perm_a = rng.integers(1, MINHASH_PRIME, size=num_perm, dtype=np.int64)
+        self.perm_b = rng.integers(0, MINHASH_PRIME, size=num_perm, dtype=np.int64)
+        self.band_mix = rng.integers(1, 2**63 - 1, size=num_perm // bands, dtype=np.int64).astype(np.uint64)
+        if mode == 'near':
+            self.create_tables()
+
+    def create_tables(self):
+        cursor = self.store.connection.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS minhash_bands
+                          (band_key INTEGER, doc_id INTEGER, PRIMARY KEY (band_key, doc_id)) WITHOUT ROWID''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_minhash_bands_doc ON minhash_bands (doc_id)")
+        self.store.connection.commit()
+
+    def existing(self, table, column, keys):
+        keys = list(set(keys))
+        found = set()
+        cursor = self.store.connection.cursor()
+        for start in range(0, len(keys), MAX_SQL_VARIABLES):
+            chunk = keys[start:start + MAX_SQL_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", chunk)
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+
+    def signatures(self, X):
+        # Assinatura MinHash de cada linha sobre o conjunto de features (tokens já hasheados)
+        X = X.tocsr()
+        row_lengths = np.diff(X.indptr)
+        non_empty = row_lengths > 0
+        signatures = np.full((X.shape[0], len(self.perm_a)), MINHASH_PRIME, dtype=np.int64)
+        if X.nnz:
+            features = X.indices.astype(np.int64)
+            starts = X.indptr[:-1][non_empty]
+            for i, (a, b) in enumerate(zip(self.perm_a, self.perm_b)):
+                signatures[non_empty, i] = np.minimum.reduceat((a * features + b) % MINHASH_PRIME, starts)
+        return signatures
+
+    def band_keys(self, X):
+        signatures = self.signatures(X).astype(np.uint64)
+        rows_per_band = signatures.shape[1] // self.bands
+        keys = np.empty((signatures.shape[0], self.bands), dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for band in range(self.bands):
+                band_signature = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+                keys[:, band] = (band_signature * self.band_mix).sum(axis=1) + np.uint64(band)
+        return keys.view(np.int64)
+
+    def filter(self, documents, X, against_store=True):
+        # Retorna (índices mantidos, duplicados exatos, quase-duplicados, chaves LSH dos mantidos);
+        # com against_store=False só os duplicados dentro do lote são descartados
+        hashes = [content_hash(doc) for doc in documents]
+        seen = self.existing('documents', 'content_hash', hashes) if against_store else set()
+        keep = []
+        exact_duplicates = 0
+        for i, doc_hash in enumerate(hashes):
+            if doc_hash in seen:
+                exact_duplicates += 1
+            else:
+                seen.add(doc_hash)
+                keep.append(i)
+
+        if self.mode != 'near' or not keep:
+            return keep, exact_duplicates, 0, None
+
+        X_kept = X[keep]
+        row_lengths = np.diff(X_kept.indptr).tolist()
+        keys = self.band_keys(X_kept)
+        seen_keys = self.existing('minhash_bands', 'band_key', keys.ravel().tolist()) if against_store else set()
+        near_keep = []
+        near_duplicates = 0
+        for position, row_keys in enumerate(keys.tolist()):
+            # Documentos sem tokens não têm assinatura útil e ficam só com a deduplicação exata
+            if row_lengths[position] and any(key in seen_keys for key in row_keys):
+                near_duplicates += 1
+                continue
+            seen_keys.update(row_keys)
+            near_keep.append(position)
+        return [keep[position] for position in near_keep], exact_duplicates, near_duplicates, keys[near_keep]
+
+    def record(self, doc_ids, band_keys):
+        if band_keys is None or not len(doc_ids):
+            return
+        with self.store.connection:
+            self.store.connection.executemany(
+                "INSERT OR IGNORE INTO minhash_bands (band_key, doc_id) VALUES (?, ?)",
+                ((key, doc_id) for doc_id, row_keys in zip(doc_ids, band_keys.tolist()) for key in row_keys))
+
+    def discard(self, doc_ids):
+        if self.mode == 'near' and doc_ids:
+            with self.store.connection:
+                self.store.connection.executemany("DELETE FROM minhash_bands WHERE doc_id = ?",
+                                                  ((doc_id,) for doc_id in doc_ids))
@@ -0,0 +1,214 @@
+import hashlib
+import sqlite3
+
+import numpy as np
+
+from .inverted_index import MAX_SQL_VARIABLES, InvertedIndex, decode_vectors, encode_rows
+
+DB_PATH = 'content_ranker.db'
+# Cache de páginas (KiB) e mmap por conexão: a conexão de escrita do treinamento usa mais memória;
+# as de leitura (uma por thread do servidor de consultas) ficam pequenas
+WRITER_CACHE_KIB = 262144
+WRITER_MMAP_BYTES = 1 << 30
+READER_CACHE_KIB = 16384
+READER_MMAP_BYTES = 256 << 20
+
+def content_hash(text):
+    # Hash de 64 bits do conteúdo, cabe em uma coluna INTEGER do SQLite
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+class DocumentStore:
+    """Armazenamento dos documentos, seus vetores e metadados em SQLite (modo WAL).
+
+    Cada lote de ingestão é gravado em uma única transação, junto com as postings do índice invertido.
+    Com read_only=True a conexão é aberta em modo somente leitura, para consultas concorrentes
+    (uma instância por thread).
+    """
+
+    def __init__(self, path=DB_PATH, n_features=2**18, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        if read_only:
+            # Cada conexão é usada por uma única thread, mas pode ser fechada por outra no encerramento
+            self.connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        else:
+            self.connection = sqlite3.connect(path)
+        self.configure_connection()
+        if not read_only:
+            self.create_schema()
+        self.index = InvertedIndex(self.connection, n_features, read_only=read_only)
+
+    @property
+    def n_features(self):
+        return self.index.n_features
+
+    @n_features.setter
+    def n_features(self, value):
+        self.index.n_features = value
+
+    def configure_connection(self):
+        cursor = self.connection.cursor()
+        if self.read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            # Com WAL, NORMAL só sincroniza nos checkpoints do log e continua consistente após falhas
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cache_kib, mmap_bytes = (READER_CACHE_KIB, READER_MMAP_BYTES) if self.read_only else \
+            (WRITER_CACHE_KIB, WRITER_MMAP_BYTES)
+        cursor.execute(f"PRAGMA cache_size=-{cache_kib}")
+        cursor.execute(f"PRAGMA mmap_size={mmap_bytes}")
+
+    def create_schema(self):
+        cursor = self.connection.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS sources
+                          (id INTEGER PRIMARY KEY, path TEXT UNIQUE)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS documents
+                          (id INTEGER PRIMARY KEY, content TEXT, vector BLOB, cluster INTEGER,
+                           source_id INTEGER, byte_offset INTEGER, content_hash INTEGER)''')
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(documents)")}
+        for column, column_type in (('vector', 'BLOB'), ('cluster', 'INTEGER'), ('source_id', 'INTEGER'),
+                                    ('byte_offset', 'INTEGER'), ('content_hash', 'INTEGER')):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE documents ADD COLUMN {column} {column_type}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_cluster ON documents (cluster)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)")
+        self.connection.commit()
+
+    def source_id(self, path):
+        if path is None:
+            return None
+        cursor = self.connection.cursor()
+        cursor.execute("INSERT OR IGNORE INTO sources (path) VALUES (?)", (path,))
+        cursor.execute("SELECT id FROM sources WHERE path = ?", (path,))
+        return cursor.fetchone()[0]
+
+    def max_id(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM documents")
+        return cursor.fetchone()[0]
+
+    def count(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM documents")
+        return cursor.fetchone()[0]
+
+    def has_indexed_documents(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT 1 FROM documents WHERE vector IS NOT NULL LIMIT 1")
+        return cursor.fetchone() is not None
+
+    def add_documents(self, documents, X, clusters=None, source=None, offsets=None):
+        if not documents:
+            return []
+        if clusters is None:
+            clusters = [None] * len(documents)
+        if offsets is None:
+            offsets = [None] * len(documents)
+        with self.connection:
+            source_id = self.source_id(source)
+            first_id = self.max_id() + 1
+            doc_ids = list(range(first_id, first_id + len(documents)))
+            self.connection.executemany(
+                '''INSERT INTO documents (id, content, vector, cluster, source_id, byte_offset, content_hash)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                zip(doc_ids, documents, encode_rows(X),
+                    [None if cluster is None else int(cluster) for cluster in clusters],
+                    [source_id] * len(documents), offsets, [content_hash(doc) for doc in documents]))
+            self.index.add_documents(doc_ids, X)
+        return doc_ids
+
+    def discard_after(self, last_document_id, source=None):
+        # Remove os documentos com id > last_document_id; com source, só os vindos desse arquivo.
+        # Retorna os ids removidos
+        condition, params = "id > ?", [last_document_id]
+        if source is not None:
+            condition += " AND source_id = (SELECT id FROM sources WHERE path = ?)"
+            params.append(source)
+        with self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute(f"SELECT id, vector FROM documents WHERE {condition} ORDER BY id", params)
+            rows = cursor.fetchall()
+            indexed = [(doc_id, vector) for doc_id, vector in rows if vector is not None]
+            if indexed:
+                X = decode_vectors([vector for _, vector in indexed], self.n_features)
+                self.index.remove_documents([doc_id for doc_id, _ in indexed], X)
+            cursor.execute(f"DELETE FROM documents WHERE {condition}", params)
+            return [doc_id for doc_id, _ in rows]
+
+    def fetch(self, doc_ids):
+        # Conteúdo dos documentos na mesma ordem dos ids
+        doc_ids = list(doc_ids)
+        contents = self.fetch_map(doc_ids)
+        return [contents[doc_id] for doc_id in doc_ids if doc_id in contents]
+
+    def fetch_map(self, doc_ids):
+        # {id: conteúdo}, com uma consulta por bloco de ids
+        doc_ids = list(set(doc_ids))
+        contents = {}
+        cursor = self.connection.cursor()
+        for start in range(0, len(doc_ids), MAX_SQL_VARIABLES):
+            chunk = doc_ids[start:start + MAX_SQL_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"SELECT id, content FROM documents WHERE id IN ({placeholders})", chunk)
+            contents.update(cursor.fetchall())
+        return contents
+
+    def fetch_vectors(self, doc_ids):
+        doc_ids = list(doc_ids)
+        vectors = {}
+        cursor = self.connection.cursor()
+        for start in range(0, len(doc_ids), MAX_SQL_VARIABLES):
+            chunk = doc_ids[start:start + MAX_SQL_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"SELECT id, vector FROM documents WHERE id IN ({placeholders}) AND vector IS NOT NULL",
+                           chunk)
+            vectors.update(cursor.fetchall())
+        found = [doc_id for doc_id in doc_ids if doc_id in vectors]
+        return found, decode_vectors([vectors[doc_id] for doc_id in found], self.n_features)
+
+    def vectors_in_clusters(self, clusters, with_clusters=False):
+        cursor = self.connection.cursor()
+        placeholders = ','.join('?' * len(clusters))
+        cursor.execute(f"SELECT id, vector, cluster FROM documents WHERE cluster IN ({placeholders}) ORDER BY id",
+                       list(clusters))
+        rows = cursor.fetchall()
+        doc_ids = [doc_id for doc_id, _, _ in rows]
+        X = decode_vectors([vector for _, vector, _ in rows], self.n_features)
+        if with_clusters:
+            return doc_ids, X, np.array([cluster for _, _, cluster in rows], dtype=np.int64)
+        return doc_ids, X
+
+    def iter_vectors(self, batch_size=10000):
+        # Percorre (ids, matriz CSR) em ordem de id, sem carregar a tabela inteira
+        cursor = self.connection.cursor()
+        last_id = 0
+        while True:
+            cursor.execute("SELECT id, vector FROM documents WHERE id > ? AND vector IS NOT NULL ORDER BY id LIMIT ?",
+                           (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            doc_ids = [doc_id for doc_id, _ in rows]
+            yield doc_ids, decode_vectors([vector for _, vector in rows], self.n_features)
+            last_id = doc_ids[-1]
+
+    def update_clusters(self, doc_ids, clusters):
+        with self.connection:
+            self.connection.executemany("UPDATE documents SET cluster = ? WHERE id = ?",
+                                        zip([int(cluster) for cluster in clusters], doc_ids))
+
+    def unindexed_documents(self, batch_size=10000):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, content FROM documents WHERE vector IS NULL ORDER BY id LIMIT ?", (batch_size,))
+        return cursor.fetchall()
+
+    def set_vectors(self, doc_ids, documents, X):
+        with self.connection:
+            self.connection.executemany("UPDATE documents SET vector = ?, content_hash = ? WHERE id = ?",
+                                        zip(encode_rows(X), [content_hash(doc) for doc in documents], doc_ids))
+            self.index.add_documents(doc_ids, X)
+
+    def close(self):
+        self.connection.close()
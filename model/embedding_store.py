@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+from .scoring import top_k
+
+META_FILE = 'meta.json'
+VECTORS_FILE = 'vectors.f32'
+IDS_FILE = 'ids.i64'
+CLUSTERS_FILE = 'clusters.i32'
+# Linhas pontuadas por vez na busca exaustiva (limita a memória do produto matriz-matriz)
+SEARCH_CHUNK_ROWS = 65536
+
+class EmbeddingStore:
+    """Vetores projetados (float32, normalizados) dos documentos em arquivos binários append-only,
+    lidos com np.memmap. Linha i: vetor, id do documento no DocumentStore e cluster.
+
+    A busca é exaustiva (produto interno via BLAS, em blocos) ou restrita aos documentos de alguns
+    clusters, como um índice IVF.
+    """
+
+    def __init__(self, directory, dim):
+        self.directory = directory
+        self.dim = dim
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, META_FILE)
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+        if meta.get('dim') != dim:
+            if meta:
+                logging.warning(f"Embeddings em {directory} têm {meta.get('dim')} dimensões (esperado {dim}); "
+                                f"descartando.")
+            self.clear()
+            with open(meta_path, 'w', encoding='utf-8') as file:
+                json.dump({'dim': dim}, file)
+        self.reset_views()
+
+    def reset_views(self):
+        self._views = None
+        self._cluster_index = None
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.path(IDS_FILE)) // 8
+        except OSError:
+            return 0
+
+    def clear(self):
+        for name in (VECTORS_FILE, IDS_FILE, CLUSTERS_FILE):
+            if os.path.exists(self.path(name)):
+                os.remove(self.path(name))
+        self.reset_views()
+
+    def add(self, doc_ids, Z, clusters=None):
+        if not len(doc_ids):
+            return
+        clusters = np.full(len(doc_ids), -1) if clusters is None else clusters
+        # Os ids são gravados por último: __len__ conta pelos ids, então um leitor nunca vê
+        # uma linha sem vetor e cluster
+        for name, array in ((VECTORS_FILE, np.asarray(Z, dtype=np.float32)),
+                            (CLUSTERS_FILE, np.asarray(clusters, dtype=np.int32)),
+                            (IDS_FILE, np.asarray(doc_ids, dtype=np.int64))):
+            with open(self.path(name), 'ab') as file:
+                file.write(np.ascontiguousarray(array).tobytes())
+        self.reset_views()
+
+    def views(self):
+        # Mapeamentos refeitos só quando o número de linhas muda
+        n_rows = len(self)
+        if self._views is None or len(self._views[1]) != n_rows:
+            if n_rows == 0:
+                self._views = (np.zeros((0, self.dim), dtype=np.float32), np.zeros(0, dtype=np.int64),
+                               np.zeros(0, dtype=np.int32))
+            else:
+                self._views = (np.memmap(self.path(VECTORS_FILE), dtype=np.float32, mode='r', shape=(n_rows, self.dim)),
+                               np.memmap(self.path(IDS_FILE), dtype=np.int64, mode='r', shape=(n_rows,)),
+                               np.memmap(self.path(CLUSTERS_FILE), dtype=np.int32, mode='r', shape=(n_rows,)))
+            self._cluster_index = None
+        return self._views
+
+    def rows_in_clusters(self, clusters):
+        # Listas invertidas do IVF: linhas ordenadas por cluster, montadas uma vez por versão dos arquivos
+        _, _, row_clusters = self.views()
+        cluster_index = self._cluster_index
+        if cluster_index is None:
+            order = np.argsort(row_clusters, kind='stable')
+            cluster_index = self._cluster_index = (order, np.asarray(row_clusters)[order])
+        order, sorted_clusters = cluster_index
+        bounds = zip(np.searchsorted(sorted_clusters, clusters, side='left'),
+                     np.searchsorted(sorted_clusters, clusters, side='right'))
+        # Em ordem de linha (= ordem de id), para os empates saírem como na busca exaustiva
+        return np.sort(np.concatenate([order[start:end] for start, end in bounds] or [order[:0]]))
+
+    def truncate(self, n_rows):
+        for name, itemsize in ((IDS_FILE, 8), (VECTORS_FILE, 4 * self.dim), (CLUSTERS_FILE, 4)):
+            if os.path.exists(self.path(name)):
+                with open(self.path(name), 'r+b') as file:
+                    file.truncate(n_rows * itemsize)
+        self.reset_views()
+
+    def discard(self, doc_ids):
+        # Remove as linhas dos documentos descartados; no caso comum elas formam o fim dos arquivos
+        # e basta truncar, senão os arquivos são regravados só com as linhas mantidas
+        _, ids, _ = self.views()
+        keep = ~np.isin(ids, np.asarray(doc_ids, dtype=np.int64))
+        n_kept = int(keep.sum())
+        if n_kept == len(ids):
+            return 0
+        if keep[:n_kept].all():
+            self.truncate(n_kept)
+        else:
+            self.compact(keep)
+        return len(ids) - n_kept
+
+    def compact(self, keep, chunk_rows=SEARCH_CHUNK_ROWS):
+        # Regrava em blocos, em arquivos temporários; os ids são trocados por último, como em add
+        views = dict(zip((VECTORS_FILE, IDS_FILE, CLUSTERS_FILE), self.views()))
+        for name in (VECTORS_FILE, CLUSTERS_FILE, IDS_FILE):
+            array = views[name]
+            with open(self.path(name) + '.tmp', 'wb') as file:
+                for start in range(0, len(keep), chunk_rows):
+                    end = start + chunk_rows
+                    file.write(np.ascontiguousarray(array[start:end][keep[start:end]]).tobytes())
+        self.reset_views()
+        del views
+        for name in (VECTORS_FILE, CLUSTERS_FILE, IDS_FILE):
+            os.replace(self.path(name) + '.tmp', self.path(name))
+
+    def iter_chunks(self, chunk_rows=SEARCH_CHUNK_ROWS):
+        vectors, doc_ids, clusters = self.views()
+        for start in range(0, len(doc_ids), chunk_rows):
+            end = start + chunk_rows
+            yield start, vectors[start:end], doc_ids[start:end], clusters[start:end]
+
+    def update_clusters(self, start, clusters):
+        with open(self.path(CLUSTERS_FILE), 'r+b') as file:
+            file.seek(start * 4)
+            file.write(np.ascontiguousarray(clusters, dtype=np.int32).tobytes())
+        self.reset_views()
+
+    def search_in_clusters(self, query, k, clusters):
+        # IVF: pontua só as linhas dos clusters sondados
+        vectors, doc_ids, _ = self.views()
+        rows = self.rows_in_clusters(np.sort(np.asarray(clusters, dtype=np.int32)))
+        scores = vectors[rows] @ query
+        return [(int(doc_ids[rows[i]]), float(scores[i])) for i in top_k(scores, k)]
+
+    def search_many(self, Q, k=5, clusters=None):
+        # Q: queries projetadas (n x dim). clusters: lista, por query, dos clusters permitidos (IVF)
+        Q = np.asarray(Q, dtype=np.float32)
+        if clusters is not None:
+            return [self.search_in_clusters(Q[row], k, clusters[row]) for row in range(Q.shape[0])]
+        n_queries = Q.shape[0]
+        best_scores = [np.zeros(0, dtype=np.float32) for _ in range(n_queries)]
+        best_ids = [np.zeros(0, dtype=np.int64) for _ in range(n_queries)]
+        for _, vectors, doc_ids, _ in self.iter_chunks():
+            scores = vectors @ Q.T
+            for row in range(n_queries):
+                row_scores = scores[:, row]
+                selected = top_k(row_scores, k)
+                # Junta com os melhores dos blocos anteriores; empates ficam com o menor id, como no índice
+                merged_scores = np.concatenate([best_scores[row], row_scores[selected]])
+                merged_ids = np.concatenate([best_ids[row], doc_ids[selected]])
+                keep = top_k(merged_scores, k)
+                best_scores[row], best_ids[row] = merged_scores[keep], merged_ids[keep]
+        return [[(int(doc_id), float(score)) for doc_id, score in zip(ids, scores)]
+                for ids, scores in zip(best_ids, best_scores)]
+
+    def search(self, query, k=5, clusters=None):
+        return self.search_many(np.atleast_2d(query), k, None if clusters is None else [clusters])[0]
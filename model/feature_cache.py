@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+
+from .batch_reader import batch_size_getter
+
+FEATURE_CACHE_DIR = 'feature_cache'
+MANIFEST_FILE = 'manifest.json'
+# Tamanho máximo do cache; acima dele as entradas usadas há mais tempo são removidas
+FEATURE_CACHE_MAX_MB = 20480
+
+def cache_key(file_hash, config):
+    # Endereçado pelo conteúdo: mesmo arquivo + mesma configuração de pré-processamento = mesma entrada
+    payload = json.dumps({'file_hash': file_hash, 'config': config}, sort_keys=True)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+def encode_texts(documents):
+    encoded = [doc.encode('utf-8') for doc in documents]
+    lengths = np.fromiter((len(doc) for doc in encoded), dtype=np.int64, count=len(encoded))
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), lengths
+
+def decode_texts(text, lengths):
+    raw = text.tobytes()
+    bounds = np.concatenate(([0], np.cumsum(lengths))).tolist()
+    return [raw[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(lengths))]
+
+class FeatureCache:
+    """Cache em disco dos lotes já pré-processados e vetorizados (textos, offsets e matriz CSR).
+
+    Cada entrada é um diretório com um manifesto e um .npz por lote, gravado só quando o arquivo
+    inteiro foi vetorizado; retreinar com outros hiperparâmetros do KMeans lê direto daqui.
+    Ao publicar uma entrada, as anteriores do mesmo arquivo de origem são removidas e, acima de
+    max_mb, as usadas há mais tempo (a data do manifesto marca o último uso).
+    """
+
+    def __init__(self, directory=FEATURE_CACHE_DIR, max_mb=FEATURE_CACHE_MAX_MB):
+        self.directory = directory
+        self.max_bytes = None if max_mb is None else max_mb * 1024 * 1024
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def manifest(self, key):
+        try:
+            with open(os.path.join(self.path(key), MANIFEST_FILE), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def has(self, key):
+        return self.manifest(key) is not None
+
+    def entries(self):
+        # (chave, manifesto, último uso) das entradas publicadas
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for key in os.listdir(self.directory):
+            manifest = self.manifest(key)
+            if manifest is not None:
+                entries.append((key, manifest, os.path.getmtime(os.path.join(self.path(key), MANIFEST_FILE))))
+        return entries
+
+    def entry_bytes(self, key, manifest):
+        if 'bytes' in manifest:
+            return manifest['bytes']
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(self.path(key)) for name in names)
+
+    def touch(self, key):
+        try:
+            os.utime(os.path.join(self.path(key), MANIFEST_FILE))
+        except OSError:
+            pass
+
+    def evict(self, keep):
+        entries = self.entries()
+        source = next((manifest.get('source') for key, manifest, _ in entries if key == keep), None)
+        remaining = []
+        for key, manifest, used in entries:
+            if key != keep and source is not None and manifest.get('source') == source:
+                self.remove(key)
+                logging.info(f"Entrada antiga do cache de features removida: {key} ({source}).")
+            else:
+                remaining.append((used, key, self.entry_bytes(key, manifest)))
+        if self.max_bytes is None:
+            return
+        total = sum(size for _, _, size in remaining)
+        for _, key, size in sorted(remaining):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total -= size
+            logging.info(f"Entrada do cache de features removida pelo limite de tamanho: {key}.")
+
+    def load_shard(self, key, name):
+        with np.load(os.path.join(self.path(key), name), allow_pickle=False) as shard:
+            X = csr_matrix((shard['data'], shard['indices'], shard['indptr']), shape=tuple(shard['shape']))
+            return shard['offsets'].tolist(), decode_texts(shard['text'], shard['lengths']), X, int(shard['end'])
+
+    def iter_batches(self, key, batch_size, start=0):
+        # Reagrupa os lotes gravados em lotes de batch_size documentos (inteiro ou função, para
+        # tamanho dinâmico); 'end' é sempre o início de uma linha, então o checkpoint continua
+        # retomando no byte certo
+        current_batch_size = batch_size_getter(batch_size)
+        self.touch(key)
+        offsets, documents, matrices = [], [], []
+        batch_start = start
+        for entry in self.manifest(key)['shards']:
+            if entry['end'] <= start:
+                continue
+            shard_offsets, shard_documents, X, end = self.load_shard(key, entry['name'])
+            first = int(np.searchsorted(shard_offsets, start)) if shard_offsets and shard_offsets[0] < start else 0
+            offsets.extend(shard_offsets[first:])
+            documents.extend(shard_documents[first:])
+            matrices.append(X[first:])
+            batch_size = current_batch_size()
+            while len(documents) > batch_size:
+                X = vstack(matrices, format='csr')
+                batch_end = offsets[batch_size]
+                yield batch_start, batch_end, offsets[:batch_size], documents[:batch_size], X[:batch_size]
+                offsets, documents, matrices = offsets[batch_size:], documents[batch_size:], [X[batch_size:]]
+                batch_start = batch_end
+                batch_size = current_batch_size()
+            if len(documents) == batch_size:
+                yield batch_start, end, offsets, documents, vstack(matrices, format='csr')
+                offsets, documents, matrices = [], [], []
+                batch_start = end
+            elif not documents:
+                batch_start = end
+        if documents:
+            yield batch_start, end, offsets, documents, vstack(matrices, format='csr')
+
+    def writer(self, key, metadata):
+        return FeatureCacheWriter(self, key, metadata)
+
+    def remove(self, key):
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+class FeatureCacheWriter:
+    """Grava os lotes conforme passam pelo treinamento e publica a entrada com um único rename."""
+
+    def __init__(self, cache, key, metadata):
+        self.cache = cache
+        self.key = key
+        self.metadata = metadata
+        self.temp_path = f'{cache.path(key)}.temp'
+        self.shards = []
+        shutil.rmtree(self.temp_path, ignore_errors=True)
+        os.makedirs(self.temp_path)
+
+    def write(self, start, end, offsets, documents, X):
+        X = X.tocsr()
+        name = f'batch_{len(self.shards):06d}.npz'
+        text, lengths = encode_texts(documents)
+        np.savez(os.path.join(self.temp_path, name), data=X.data, indices=X.indices, indptr=X.indptr,
+                 shape=np.array(X.shape), offsets=np.array(offsets, dtype=np.int64), text=text, lengths=lengths,
+                 end=np.array(end))
+        self.shards.append({'name': name, 'start': start, 'end': end, 'documents': len(documents)})
+
+    def commit(self):
+        size = sum(os.path.getsize(os.path.join(self.temp_path, shard['name'])) for shard in self.shards)
+        manifest = dict(self.metadata, shards=self.shards, bytes=size)
+        with open(os.path.join(self.temp_path, MANIFEST_FILE), 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+        path = self.cache.path(self.key)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(self.temp_path, path)
+        logging.info(f"Cache de features gravado em {path} ({len(self.shards)} lotes).")
+        self.cache.evict(self.key)
+
+    def abort(self):
+        shutil.rmtree(self.temp_path, ignore_errors=True)
@@ -0,0 +1,186 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from .scoring import top_k, top_k_rows
+
+# Limite conservador de parâmetros por instrução do SQLite
+MAX_SQL_VARIABLES = 900
+# Na busca por uma query, features presentes em mais que esta fração dos documentos (e em mais
+# de MIN_FREQUENT_DF) não geram candidatos; abaixo de MIN_FREQUENT_DF documentos nada é podado
+FREQUENT_FEATURE_FRACTION = 0.02
+MIN_FREQUENT_DF = 1000
+
+def encode_vector(indices, data):
+    # Vetor esparso serializado como [índices int32][pesos float32]
+    return np.asarray(indices, dtype='<i4').tobytes() + np.asarray(data, dtype='<f4').tobytes()
+
+def decode_vector(blob):
+    nnz = len(blob) // 8
+    indices = np.frombuffer(blob, dtype='<i4', count=nnz)
+    data = np.frombuffer(blob, dtype='<f4', count=nnz, offset=4 * nnz)
+    return indices, data
+
+def decode_vectors(blobs, n_features):
+    indptr = [0]
+    indices, data = [], []
+    for blob in blobs:
+        row_indices, row_data = decode_vector(blob or b'')
+        indices.append(row_indices)
+        data.append(row_data)
+        indptr.append(indptr[-1] + len(row_indices))
+    if not indices:
+        return csr_matrix((0, n_features), dtype=np.float32)
+    return csr_matrix((np.concatenate(data), np.concatenate(indices), np.array(indptr, dtype=np.int64)),
+                      shape=(len(indptr) - 1, n_features))
+
+def encode_rows(X):
+    X = X.tocsr()
+    return [encode_vector(X.indices[start:end], X.data[start:end])
+            for start, end in zip(X.indptr[:-1], X.indptr[1:])]
+
+def frequent_feature_limit(n_documents):
+    return max(MIN_FREQUENT_DF, int(FREQUENT_FEATURE_FRACTION * n_documents))
+
+class InvertedIndex:
+    """Índice invertido persistente sobre os ids de features do HashingVectorizer.
+
+    Cada posting guarda o peso já normalizado (L2) do termo no documento, então
+    o cosseno com a query é a soma dos produtos nas posting lists dos termos da query.
+    """
+
+    def __init__(self, connection, n_features, read_only=False):
+        self.connection = connection
+        self.n_features = n_features
+        if not read_only:
+            self.create_tables()
+
+    def create_tables(self):
+        cursor = self.connection.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS postings
+                          (feature INTEGER, doc_id INTEGER, weight REAL,
+                           PRIMARY KEY (feature, doc_id)) WITHOUT ROWID''')
+        self.connection.commit()
+
+    def add_documents(self, doc_ids, X):
+        X = X.tocsr()
+        row_ids = np.repeat(np.asarray(doc_ids, dtype=np.int64), np.diff(X.indptr))
+        cursor = self.connection.cursor()
+        cursor.executemany("INSERT OR REPLACE INTO postings (feature, doc_id, weight) VALUES (?, ?, ?)",
+                           zip(X.indices.tolist(), row_ids.tolist(), X.data.tolist()))
+
+    def remove_documents(self, doc_ids, X):
+        X = X.tocsr()
+        row_ids = np.repeat(np.asarray(doc_ids, dtype=np.int64), np.diff(X.indptr))
+        cursor = self.connection.cursor()
+        cursor.executemany("DELETE FROM postings WHERE feature = ? AND doc_id = ?",
+                           zip(X.indices.tolist(), row_ids.tolist()))
+
+    def document_frequency(self, feature, limit):
+        # Contagem limitada: percorre no máximo limit + 1 postings da feature
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM (SELECT 1 FROM postings WHERE feature = ? LIMIT ?)", (feature, limit + 1))
+        return cursor.fetchone()[0]
+
+    def fetch_postings(self, features, doc_ids=None):
+        # Linhas (feature, doc_id, weight) das features, opcionalmente só dos documentos doc_ids
+        cursor = self.connection.cursor()
+        rows = []
+        for start in range(0, len(features), MAX_SQL_VARIABLES):
+            chunk = features[start:start + MAX_SQL_VARIABLES]
+            placeholders = ','.join('?' * len(chunk))
+            if doc_ids is None:
+                cursor.execute(f"SELECT feature, doc_id, weight FROM postings WHERE feature IN ({placeholders})", chunk)
+                rows.extend(cursor.fetchall())
+                continue
+            step = MAX_SQL_VARIABLES - len(chunk)
+            for id_start in range(0, len(doc_ids), step):
+                id_chunk = doc_ids[id_start:id_start + step]
+                cursor.execute(f"SELECT feature, doc_id, weight FROM postings WHERE feature IN ({placeholders}) "
+                               f"AND doc_id IN ({','.join('?' * len(id_chunk))})", chunk + id_chunk)
+                rows.extend(cursor.fetchall())
+        return rows
+
+    def split_frequent(self, features, max_df):
+        # (features que geram candidatos, features em mais de max_df documentos, que só completam scores)
+        if max_df is None:
+            return list(features), []
+        rare, frequent = [], []
+        for feature in features:
+            (rare if self.document_frequency(feature, max_df) <= max_df else frequent).append(feature)
+        return rare, frequent
+
+    def search(self, query_vec, k=5, max_df=None):
+        # Com max_df, features presentes em mais de max_df documentos (stopwords, na prática) não
+        # geram candidatos: só completam o score dos candidatos que ainda podem entrar no top-k.
+        # Documentos que têm apenas essas features em comum com a query ficam de fora
+        query_vec = query_vec.tocsr()
+        query_weights = dict(zip(query_vec.indices.tolist(), query_vec.data.tolist()))
+        rare, frequent = self.split_frequent(query_weights, max_df)
+        if not rare:
+            rare, frequent = frequent, []
+
+        rows = self.fetch_postings(rare)
+        if not rows:
+            return []
+        posting_features, posting_ids, posting_weights = zip(*rows)
+        doc_ids, inverse = np.unique(np.array(posting_ids, dtype=np.int64), return_inverse=True)
+        weights = np.array(posting_weights, dtype=np.float64) * \
+            np.array([query_weights[feature] for feature in posting_features])
+        scores = np.bincount(inverse, weights=weights)
+
+        if frequent:
+            # Pesos normalizados (<= 1): cada feature frequente soma no máximo o seu peso na query.
+            # Quem não alcança o k-ésimo score parcial nem com esse acréscimo não entra no top-k
+            bound = sum(query_weights[feature] for feature in frequent)
+            ranked = top_k(scores, k)
+            threshold = scores[ranked[-1]] if len(ranked) else 0.0
+            open_ids = doc_ids[scores + bound >= threshold].tolist()
+            rows = self.fetch_postings(frequent, open_ids)
+            if rows:
+                posting_features, posting_ids, posting_weights = zip(*rows)
+                positions = np.searchsorted(doc_ids, np.array(posting_ids, dtype=np.int64))
+                np.add.at(scores, positions, np.array(posting_weights, dtype=np.float64) *
+                          np.array([query_weights[feature] for feature in posting_features]))
+        return [(int(doc_ids[i]), float(scores[i])) for i in top_k(scores, k)]
+
+    def search_many(self, query_vecs, k=5, max_df=None):
+        # Lote de queries: as posting lists da união dos termos são lidas uma única vez
+        # (uma consulta por bloco de features) e todos os scores saem de um produto esparso
+        # (queries x features) @ (features x documentos candidatos). Com max_df, a mesma regra de
+        # search: só as features raras geram candidatos para cada query
+        query_vecs = query_vecs.tocsr()
+        n_queries = query_vecs.shape[0]
+        rare, frequent = self.split_frequent(np.unique(query_vecs.indices).tolist(), max_df)
+        results = [None] * n_queries
+        if frequent:
+            # Queries só com features frequentes seguem search, em que elas mesmas geram os candidatos
+            is_frequent = np.zeros(self.n_features, dtype=bool)
+            is_frequent[frequent] = True
+            for row in range(n_queries):
+                features = query_vecs.indices[query_vecs.indptr[row]:query_vecs.indptr[row + 1]]
+                if len(features) and is_frequent[features].all():
+                    results[row] = self.search(query_vecs[row], k, max_df)
+
+        rows = self.fetch_postings(rare)
+        if not rows:
+            return [ranked or [] for ranked in results]
+        posting_features, posting_ids, posting_weights = zip(*rows)
+        doc_ids, columns = np.unique(np.array(posting_ids, dtype=np.int64), return_inverse=True)
+        postings = csr_matrix((np.array(posting_weights, dtype=np.float64),
+                               (np.array(posting_features, dtype=np.int64), columns)),
+                              shape=(self.n_features, len(doc_ids)))
+        allowed = None
+        if frequent:
+            candidates = (query_vecs @ postings).tocsr()
+            rows = self.fetch_postings(frequent, doc_ids.tolist())
+            if rows:
+                posting_features, posting_ids, posting_weights = zip(*rows)
+                postings = postings + csr_matrix(
+                    (np.array(posting_weights, dtype=np.float64),
+                     (np.array(posting_features, dtype=np.int64),
+                      np.searchsorted(doc_ids, np.array(posting_ids, dtype=np.int64)))),
+                    shape=postings.shape)
+
+            def allowed(row, row_columns):
+                return np.isin(row_columns, candidates.indices[candidates.indptr[row]:candidates.indptr[row + 1]])
+        ranked_rows = top_k_rows(query_vecs @ postings, doc_ids, k, allowed)
+        return [ranked if ranked is not None else ranked_rows[row] for row, ranked in enumerate(results)]
@@ -0,0 +1,134 @@
+import gc
+import logging
+import time
+from collections import deque
+
+# Frações do orçamento: acima de SHRINK_AT o lote é reduzido, abaixo de GROW_AT volta a crescer
+SHRINK_AT = 0.85
+GROW_AT = 0.6
+GROWTH_FACTOR = 1.25
+# Uso de memória do sistema (%) a partir do qual o treinamento espera, como no antigo check_resources
+SYSTEM_MEMORY_LIMIT = 90
+
+class MemoryGovernor:
+    """Mede o RSS do treinamento (processo principal e workers) a cada lote e ajusta o tamanho
+    efetivo do lote para ficar abaixo de budget_mb. Sob pressão de memória segura o próximo lote
+    (backpressure) em vez de descartá-lo."""
+
+    def __init__(self, batch_size, budget_mb=None, min_batch_size=1000, max_batch_size=None, max_wait=60,
+                 poll_interval=1.0):
+        self.max_batch_size = max_batch_size or batch_size
+        self.min_batch_size = min(min_batch_size, self.max_batch_size)
+        self.current_batch_size = min(batch_size, self.max_batch_size)
+        self.budget = budget_mb * 1e6 if budget_mb else None
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.rss = 0
+        self.peak_rss = 0
+        self.shrinks = 0
+        self.grows = 0
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        self.decisions = deque(maxlen=50)
+        # O lote é reduzido no máximo uma vez entre wait_for_memory() e observe() do mesmo lote
+        self._shrunk = False
+        self._process = None
+
+    def batch_size(self):
+        return self.current_batch_size
+
+    def measure(self):
+        import psutil
+        if self._process is None:
+            self._process = psutil.Process()
+        rss = self._process.memory_info().rss
+        for child in self._process.children():
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.rss = rss
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def over_budget(self):
+        return bool(self.budget) and self.measure() > self.budget
+
+    def system_under_pressure(self):
+        import psutil
+        return psutil.virtual_memory().percent > SYSTEM_MEMORY_LIMIT
+
+    def under_pressure(self):
+        return self.over_budget() or self.system_under_pressure()
+
+    def decide(self, action, reason):
+        self.decisions.append({"time": time.time(), "action": action, "batch_size": self.current_batch_size,
+                               "rss_mb": self.rss / 1e6, "reason": reason})
+        logging.info(f"Governador de memória: {action} ({reason}); lote = {self.current_batch_size}, "
+                     f"RSS = {self.rss / 1e6:.0f} MB")
+
+    def wait_for_memory(self):
+        # Backpressure antes do próximo lote; o lote nunca é descartado. Acima do orçamento do
+        # próprio processo esperar não devolve memória: libera o que der e reduz o lote. Com a
+        # memória do sistema estourada (outros processos na máquina) espera até max_wait segundos
+        waited = 0.0
+        if self.over_budget():
+            gc.collect()
+            self.shrink("RSS acima do orçamento")
+        if self.system_under_pressure():
+            start = time.monotonic()
+            self.pauses += 1
+            gc.collect()
+            self.shrink(f"memória do sistema acima de {SYSTEM_MEMORY_LIMIT}%")
+            while self.system_under_pressure() and time.monotonic() - start < self.max_wait:
+                time.sleep(self.poll_interval)
+            waited = time.monotonic() - start
+            self.paused_seconds += waited
+            self.decide("pausa", f"{waited:.1f}s esperando memória do sistema")
+            if self.system_under_pressure():
+                logging.warning(f"Memória do sistema ainda acima de {SYSTEM_MEMORY_LIMIT}% após {waited:.0f}s; "
+                                f"continuando com lote de {self.current_batch_size} documentos.")
+        return waited
+
+    def shrink(self, reason):
+        if self._shrunk:
+            return
+        new_size = max(self.min_batch_size, self.current_batch_size // 2)
+        if new_size < self.current_batch_size:
+            self.current_batch_size = new_size
+            self.shrinks += 1
+            self._shrunk = True
+            self.decide("reduzir", reason)
+
+    def grow(self, reason):
+        new_size = min(self.max_batch_size, int(self.current_batch_size * GROWTH_FACTOR))
+        if new_size > self.current_batch_size:
+            self.current_batch_size = new_size
+            self.grows += 1
+            self.decide("aumentar", reason)
+
+    def observe(self):
+        # Chamado depois de cada lote: reduz o lote perto do orçamento e o recupera com folga
+        rss = self.measure()
+        if self.budget:
+            if rss > self.budget * SHRINK_AT:
+                self.shrink(f"RSS acima de {SHRINK_AT:.0%} do orçamento")
+            elif rss < self.budget * GROW_AT:
+                self.grow(f"RSS abaixo de {GROW_AT:.0%} do orçamento")
+        self._shrunk = False
+        return self.current_batch_size
+
+    def snapshot(self):
+        return {
+            "budget_mb": self.budget / 1e6 if self.budget else None,
+            "batch_size": self.current_batch_size,
+            "min_batch_size": self.min_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "rss_mb": self.rss / 1e6,
+            "peak_rss_mb": self.peak_rss / 1e6,
+            "shrinks": self.shrinks,
+            "grows": self.grows,
+            "pauses": self.pauses,
+            "paused_seconds": self.paused_seconds,
+            "decisions": list(self.decisions)
+        }
@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_DIR = 'profiles'
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+class StageMetrics:
+    """Tempo acumulado por etapa (treinamento e consultas) e contadores, seguros entre threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # etapa -> [chamadas, segundos totais, maior duração, itens processados]
+        self._stages = {}
+        self._counters = {}
+        self.started = time.time()
+
+    @contextmanager
+    def timer(self, stage, items=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, items)
+
+    def add(self, stage, seconds, items=0):
+        with self._lock:
+            totals = self._stages.setdefault(stage, [0, 0.0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+            totals[3] += items
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self, prefix=''):
+        with self._lock:
+            for stage in [stage for stage in self._stages if stage.startswith(prefix)]:
+                del self._stages[stage]
+            for name in [name for name in self._counters if name.startswith(prefix)]:
+                del self._counters[name]
+
+    def snapshot(self, prefix=''):
+        with self._lock:
+            stages = {stage: list(totals) for stage, totals in self._stages.items() if stage.startswith(prefix)}
+            counters = {name: value for name, value in self._counters.items() if name.startswith(prefix)}
+        total_seconds = sum(totals[1] for totals in stages.values())
+        snapshot = {"stages": {}, "counters": counters}
+        for stage, (calls, seconds, max_seconds, items) in sorted(stages.items(), key=lambda item: -item[1][1]):
+            snapshot["stages"][stage] = {
+                "calls": calls,
+                "seconds": seconds,
+                "mean_ms": seconds / calls * 1000,
+                "max_ms": max_seconds * 1000,
+                "share": seconds / total_seconds if total_seconds > 0 else 0.0
+            }
+            if items:
+                snapshot["stages"][stage]["items"] = items
+                snapshot["stages"][stage]["items_per_second"] = items / seconds if seconds > 0 else 0.0
+        return snapshot
+
+class MetricsWriter:
+    """Acrescenta snapshots de métricas a um arquivo JSON lines, no máximo um a cada interval segundos."""
+
+    def __init__(self, path, interval=60):
+        self.path = path
+        self.interval = interval
+        self.last_write = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def due(self):
+        return time.monotonic() - self.last_write >= self.interval
+
+    def write(self, snapshot):
+        self.last_write = time.monotonic()
+        record = dict(snapshot, timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        try:
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar as métricas em {self.path}: {e}")
+
+class ProfileWindow:
+    """Perfila os lotes [start, start + n_batches) do treinamento com cProfile (tempo por função,
+    só no processo principal) ou tracemalloc (alocações por linha)."""
+
+    def __init__(self, mode, start=0, n_batches=20, output_dir=PROFILE_DIR):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfilamento desconhecido: {mode}. Opções: {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.start = start
+        self.n_batches = n_batches
+        self.output_dir = output_dir
+        self.active = False
+        self.batches = 0
+        self.result = None
+        self._profiler = None
+        self._baseline = None
+
+    def step(self, batch_index):
+        # Chamado antes de cada lote; abre e fecha a janela nos índices configurados
+        if not self.active and self.result is None and batch_index == self.start:
+            self.begin()
+        elif self.active and batch_index >= self.start + self.n_batches:
+            self.finish()
+        if self.active:
+            self.batches += 1
+
+    def begin(self):
+        if self.mode == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            import tracemalloc
+            tracemalloc.start(25)
+            self._baseline = tracemalloc.take_snapshot()
+        self.active = True
+        logging.info(f"Perfilamento ({self.mode}) iniciado no lote {self.start}.")
+
+    def finish(self):
+        if not self.active:
+            return self.result
+        self.active = False
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = os.path.join(self.output_dir, f"train_{time.strftime('%Y%m%d_%H%M%S')}_{self.mode}")
+
+        if self.mode == 'cprofile':
+            import pstats
+            self._profiler.disable()
+            path = name + '.prof'
+            self._profiler.dump_stats(path)
+            with open(name + '.txt', 'w', encoding='utf-8') as file:
+                pstats.Stats(self._profiler, stream=file).sort_stats('cumulative').print_stats(40)
+            self.result = {"mode": self.mode, "batches": self.batches, "path": path, "summary": name + '.txt'}
+        else:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = name + '.txt'
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(f"Pico de memória rastreada: {peak / 1e6:.1f} MB em {self.batches} lotes\n\n")
+                for stat in snapshot.compare_to(self._baseline, 'lineno')[:40]:
+                    file.write(f"{stat}\n")
+            self.result = {"mode": self.mode, "batches": self.batches, "path": path, "peak_mb": peak / 1e6}
+        self._profiler = self._baseline = None
+        logging.info(f"Perfilamento ({self.mode}) salvo em {self.result['path']}")
+        return self.result
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import re
+import shutil
+from functools import lru_cache
+
+import numpy as np
+
+# Formato em diretório: model.json (hiperparâmetros e estado) + matrizes .npy que
+# podem ser abertas com mmap_mode='r' e compartilhadas entre processos.
+# Versão 2: matrizes opcionalmente em um único .npz comprimido (checkpoints compactos, sem mmap)
+FORMAT_VERSION = 2
+HEADER_FILE = 'model.json'
+ARRAYS_ARCHIVE = 'arrays.npz'
+
+def vectorizer_config(vectorizer):
+    config = {}
+    for name, value in vectorizer.get_params().items():
+        if name == 'dtype':
+            value = np.dtype(value).name
+        elif isinstance(value, tuple):
+            value = list(value)
+        elif callable(value):
+            raise ValueError(f"Parâmetro '{name}' do vetorizador não é serializável.")
+        config[name] = value
+    return config
+
+def build_vectorizer(config):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    config = dict(config)
+    config['dtype'] = np.dtype(config.get('dtype', 'float64')).type
+    if 'ngram_range' in config:
+        config['ngram_range'] = tuple(config['ngram_range'])
+    return HashingVectorizer(**config)
+
+# O MiniBatchKMeans não tem API para retomar um partial_fit: o estado privado que ele lê
+# (_counts, _n_since_last_reassign, _batch_size, _n_threads, _random_state) só é tocado nas funções
+# abaixo. Conferido nas versões do scikit-learn neste intervalo (inclusive); fora dele, um aviso
+KMEANS_PRIVATE_STATE_VERSIONS = ((1, 0), (1, 9))
+
+@lru_cache(maxsize=None)
+def check_kmeans_private_state():
+    import sklearn
+    version = tuple(int(part) for part in re.findall(r'\d+', sklearn.__version__)[:2])
+    low, high = KMEANS_PRIVATE_STATE_VERSIONS
+    if not low <= version <= high:
+        logging.warning(f"scikit-learn {sklearn.__version__} fora das versões conferidas para restaurar o "
+                        f"MiniBatchKMeans ({low[0]}.{low[1]} a {high[0]}.{high[1]}); "
+                        f"verifique a retomada do treinamento.")
+
+def openmp_threads():
+    try:
+        from sklearn.utils._openmp_helpers import _openmp_effective_n_threads
+    except ImportError:
+        return os.cpu_count() or 1
+    return _openmp_effective_n_threads()
+
+def kmeans_counts(kmeans):
+    return kmeans._counts
+
+def set_kmeans_centers(kmeans, centers, counts):
+    # Troca centróides e contagens juntos (cópia gravável, conversão para float32...)
+    kmeans.cluster_centers_ = centers
+    kmeans._counts = counts
+
+def kmeans_config(kmeans):
+    params = kmeans.get_params()
+    if not isinstance(params.get('random_state'), (int, type(None))):
+        params['random_state'] = None
+    state = {}
+    if hasattr(kmeans, 'cluster_centers_'):
+        state = {
+            'n_steps': int(getattr(kmeans, 'n_steps_', 0)),
+            'n_since_last_reassign': int(getattr(kmeans, '_n_since_last_reassign', 0)),
+            'batch_size': int(getattr(kmeans, '_batch_size', kmeans.batch_size))
+        }
+        random_state = getattr(kmeans, '_random_state', None)
+        if isinstance(random_state, np.random.RandomState):
+            _, _, pos, has_gauss, cached_gaussian = random_state.get_state()
+            state['random_state'] = {'pos': int(pos), 'has_gauss': int(has_gauss),
+                                     'cached_gaussian': float(cached_gaussian)}
+    return params, state
+
+def kmeans_arrays(kmeans):
+    if not hasattr(kmeans, 'cluster_centers_'):
+        return {}
+    arrays = {'cluster_centers': kmeans.cluster_centers_, 'counts': kmeans._counts}
+    random_state = getattr(kmeans, '_random_state', None)
+    if isinstance(random_state, np.random.RandomState):
+        arrays['random_state_keys'] = random_state.get_state()[1]
+    return arrays
+
+def build_kmeans(params, state, arrays):
+    from sklearn.cluster import MiniBatchKMeans
+    kmeans = MiniBatchKMeans(**params)
+    centers = arrays.get('cluster_centers')
+    if centers is not None:
+        check_kmeans_private_state()
+        counts = arrays.get('counts')
+        # Atributos que o partial_fit/predict esperam de um modelo já inicializado
+        set_kmeans_centers(kmeans, centers,
+                           counts if counts is not None else np.zeros(centers.shape[0], dtype=centers.dtype))
+        kmeans.n_features_in_ = centers.shape[1]
+        kmeans._n_features_out = centers.shape[0]
+        kmeans.n_steps_ = state.get('n_steps', 0)
+        kmeans._n_since_last_reassign = state.get('n_since_last_reassign', 0)
+        kmeans._batch_size = state.get('batch_size', kmeans.batch_size)
+        kmeans._n_threads = openmp_threads()
+        # Sem o gerador salvo (modelos antigos), o partial_fit o recria a partir de random_state
+        if 'random_state' in state and arrays.get('random_state_keys') is not None:
+            random_state = np.random.RandomState()
+            saved = state['random_state']
+            random_state.set_state(('MT19937', np.asarray(arrays['random_state_keys'], dtype=np.uint32),
+                                    saved['pos'], saved['has_gauss'], saved['cached_gaussian']))
+            kmeans._random_state = random_state
+    return kmeans
+
+def save_model_files(path, header, arrays, compress=False):
+    # Escreve em um diretório temporário e troca de uma vez, para nunca deixar um modelo pela metade
+    temp_path = f'{path}.temp'
+    old_path = f'{path}.old'
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+    try:
+        if compress:
+            np.savez_compressed(os.path.join(temp_path, ARRAYS_ARCHIVE), **arrays)
+        else:
+            for name, array in arrays.items():
+                np.save(os.path.join(temp_path, f'{name}.npy'), np.ascontiguousarray(array))
+        # Modelos sem compressão continuam na versão 1, legível por versões anteriores
+        header = dict(header, format_version=2 if compress else 1, arrays=sorted(arrays), compressed=compress)
+        with open(os.path.join(temp_path, HEADER_FILE), 'w', encoding='utf-8') as file:
+            json.dump(header, file, indent=2)
+        if os.path.exists(path):
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(path, old_path)
+        os.replace(temp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+
+def load_model_files(path, mmap_mode=None):
+    with open(os.path.join(path, HEADER_FILE), 'r', encoding='utf-8') as file:
+        header = json.load(file)
+    if header.get('format_version', 0) > FORMAT_VERSION:
+        raise ValueError(f"Formato de modelo {header['format_version']} não suportado (máximo {FORMAT_VERSION}).")
+    if header.get('compressed'):
+        with np.load(os.path.join(path, ARRAYS_ARCHIVE)) as archive:
+            arrays = {name: archive[name] for name in header.get('arrays', [])}
+    else:
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in header.get('arrays', [])}
+    return header, arrays
+
+def is_model_dir(path):
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
@@ -0,0 +1,91 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+PROJECTION_METHODS = ('random', 'svd')
+DEFAULT_PROJECTION_DIM = 256
+MIN_PROJECTION_DIM = 16
+
+class Projection:
+    """Projeta os vetores esparsos do HashingVectorizer (2**18 dimensões) em poucas centenas de
+    dimensões densas float32, normalizadas (L2) para que o produto interno seja o cosseno.
+
+    'random': projeção aleatória esparsa (Achlioptas/Li), determinística pela semente, sem treino.
+    'svd': SVD truncado ajustado no primeiro lote do treinamento, restrito às colunas vistas nele
+    (o resto do espaço hashed não tem peso nenhum nas componentes).
+    """
+
+    def __init__(self, method='random', n_components=DEFAULT_PROJECTION_DIM, seed=42):
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"Projeção desconhecida: {method}. Opções: {', '.join(PROJECTION_METHODS)}")
+        if n_components < MIN_PROJECTION_DIM:
+            raise ValueError(f"A projeção precisa de pelo menos {MIN_PROJECTION_DIM} dimensões.")
+        self.method = method
+        self.n_components = n_components
+        self.seed = seed
+        self.n_features = None
+        # Colunas do espaço original usadas pela projeção (None = todas) e matriz
+        # (colunas x n_components): CSR na projeção aleatória, densa no SVD
+        self.columns = None
+        self.components = None
+
+    def is_fitted(self):
+        return self.components is not None
+
+    def fit(self, X):
+        X = csr_matrix(X)
+        self.n_features = X.shape[1]
+        if self.method == 'random':
+            from sklearn.random_projection import SparseRandomProjection
+            # A densidade padrão (1/sqrt(n_features)) deixa cada termo com ~0,5 componente não nula em
+            # 2**18 dimensões e textos curtos colapsam; 1/sqrt(n_components) dá a cada termo algumas dezenas
+            projection = SparseRandomProjection(n_components=self.n_components, density=1 / np.sqrt(self.n_components),
+                                                random_state=self.seed)
+            projection.fit(csr_matrix((1, self.n_features)))
+            self.components = csr_matrix(projection.components_.T, dtype=np.float32)
+        else:
+            from sklearn.decomposition import TruncatedSVD
+            self.columns = np.unique(X.indices).astype(np.int64)
+            n_components = min(self.n_components, len(self.columns) - 1, X.shape[0] - 1)
+            if n_components < 1:
+                raise ValueError("Lote pequeno demais para ajustar a projeção SVD.")
+            svd = TruncatedSVD(n_components=n_components, random_state=self.seed)
+            svd.fit(X[:, self.columns])
+            components = np.zeros((len(self.columns), self.n_components), dtype=np.float32)
+            components[:, :n_components] = svd.components_.T
+            self.components = components
+        return self
+
+    def transform(self, X):
+        X = csr_matrix(X, dtype=np.float32)
+        if self.columns is not None:
+            X = X[:, self.columns]
+        Z = X @ self.components
+        Z = np.asarray(Z.todense() if hasattr(Z, 'todense') else Z, dtype=np.float32)
+        norms = np.linalg.norm(Z, axis=1, keepdims=True)
+        np.divide(Z, norms, out=Z, where=norms > 0)
+        return Z
+
+    def config(self):
+        return {'method': self.method, 'n_components': self.n_components, 'seed': self.seed,
+                'n_features': self.n_features}
+
+    def arrays(self):
+        if not self.is_fitted():
+            return {}
+        if self.method == 'random':
+            return {'projection_data': self.components.data, 'projection_indices': self.components.indices,
+                    'projection_indptr': self.components.indptr}
+        return {'projection_columns': self.columns, 'projection_components': self.components}
+
+    @classmethod
+    def restore(cls, config, arrays):
+        projection = cls(config['method'], config['n_components'], config.get('seed', 42))
+        projection.n_features = config.get('n_features')
+        if projection.method == 'random' and 'projection_data' in arrays:
+            projection.components = csr_matrix(
+                (arrays['projection_data'], arrays['projection_indices'], arrays['projection_indptr']),
+                shape=(projection.n_features, projection.n_components))
+        elif 'projection_components' in arrays:
+            projection.columns = np.asarray(arrays['projection_columns'])
+            projection.components = arrays['projection_components']
+        return projection
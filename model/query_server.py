@@ -0,0 +1,222 @@
+"""Servidor HTTP local de consultas sobre um modelo já treinado.
+
+O modelo é carregado uma vez (centróides em mmap, somente leitura) e compartilhado por um pool
+limitado de threads; cada thread consulta o SQLite por uma conexão própria, somente leitura.
+
+Uso: python -m model.query_server --model content_ranker_model --port 8080 --threads 8
+
+    GET  /query?q=texto&k=5
+    POST /query   {"query": "texto", "k": 5}
+    GET  /metrics
+    GET  /health
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from .content_ranker import MODEL_PATH, load_model
+
+DEFAULT_PORT = 8080
+
+class LatencyStats:
+    """Latências das últimas consultas (janela fixa) e contadores de requisições."""
+
+    def __init__(self, window=10000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.bad_requests = 0
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.requests += 1
+            if error:
+                self.errors += 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def bad_request(self):
+        with self._lock:
+            self.bad_requests += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            snapshot = {"requests": self.requests, "errors": self.errors, "rejected": self.rejected,
+                        "bad_requests": self.bad_requests, "window": len(latencies)}
+        if len(latencies):
+            p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+            snapshot.update(p50_ms=p50, p90_ms=p90, p99_ms=p99, max_ms=latencies.max() * 1000)
+        return snapshot
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Conexões lentas ou ociosas não prendem uma thread do pool indefinidamente
+    timeout = 30
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/query':
+            params = parse_qs(url.query)
+            self.handle_query(params.get('q', [''])[0], params.get('k', [5])[0])
+        elif url.path == '/metrics':
+            self.send_json(200, self.server.metrics())
+        elif url.path == '/health':
+            self.send_json(200, {"status": "ok", "trained": self.server.ranker.is_trained()})
+        else:
+            self.send_json(404, {"error": "Rota não encontrada."})
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/query':
+            self.send_json(404, {"error": "Rota não encontrada."})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except (ValueError, json.JSONDecodeError):
+            self.send_bad_request("Corpo JSON inválido.")
+            return
+        if not isinstance(body, dict):
+            self.send_bad_request("O corpo deve ser um objeto JSON.")
+            return
+        self.handle_query(body.get('query', ''), body.get('k', 5))
+
+    def handle_query(self, query, k):
+        if not isinstance(query, str):
+            self.send_bad_request("Parâmetro query deve ser texto.")
+            return
+        try:
+            k = max(1, min(int(k), self.server.max_k))
+        except (TypeError, ValueError):
+            self.send_bad_request("Parâmetro k inválido.")
+            return
+        if not query.strip():
+            self.send_bad_request("Consulta vazia.")
+            return
+
+        ranker = self.server.ranker
+        start = time.perf_counter()
+        ranker.metrics.count('query.requests')
+        try:
+            # A resposta é montada com os documentos já buscados, sem passar de novo por answer_query
+            results = ranker.rank_content(query, k)
+            documents = ranker.extract_relevant_info(query, results)
+            with ranker.metrics.timer('query.generate'):
+                answer = ranker.generate_response(query, documents)
+            response = {
+                "query": query,
+                "answer": answer,
+                "results": [{"id": doc_id, "score": score, "content": content}
+                            for (doc_id, score), content in zip(results, documents)]
+            }
+        except Exception as e:
+            ranker.metrics.count('query.errors')
+            self.server.latency.record(time.perf_counter() - start, error=True)
+            logging.error(f"Erro ao processar consulta no servidor: {e}")
+            self.send_json(500, {"error": str(e)})
+            return
+        elapsed = time.perf_counter() - start
+        self.server.latency.record(elapsed)
+        response["elapsed_ms"] = elapsed * 1000
+        self.send_json(200, response)
+
+    def send_bad_request(self, message):
+        self.server.latency.bad_request()
+        self.send_json(400, {"error": message})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+class QueryServer(HTTPServer):
+    """HTTPServer com um pool fixo de threads e fila limitada: acima de n_threads + max_pending
+    conexões simultâneas o servidor responde 503 na hora em vez de acumular latência."""
+
+    def __init__(self, ranker, host='127.0.0.1', port=DEFAULT_PORT, n_threads=8, max_pending=64, max_k=50):
+        super().__init__((host, port), QueryRequestHandler)
+        self.ranker = ranker
+        self.ranker.enable_concurrent_queries()
+        self.max_k = max_k
+        self.latency = LatencyStats()
+        self.executor = ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix='query')
+        self.slots = threading.BoundedSemaphore(n_threads + max_pending)
+        self.n_threads = n_threads
+        self.max_pending = max_pending
+
+    def process_request(self, request, client_address):
+        if not self.slots.acquire(blocking=False):
+            self.latency.reject()
+            try:
+                request.sendall(b'HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def metrics(self):
+        return {
+            "latency": self.latency.snapshot(),
+            "query_cache": self.ranker.query_cache.stats(),
+            "stages": self.ranker.metrics.snapshot('query.'),
+            "threads": self.n_threads,
+            "max_pending": self.max_pending
+        }
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+        self.ranker.close_readers()
+
+def serve(model_path=MODEL_PATH, host='127.0.0.1', port=DEFAULT_PORT, n_threads=8, max_pending=64):
+    ranker = load_model(model_path, mmap_mode='r')
+    server = QueryServer(ranker, host, port, n_threads, max_pending)
+    print(f"Servidor de consultas em http://{host}:{server.server_address[1]} ({n_threads} threads)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando o servidor de consultas...")
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--max-pending', type=int, default=64)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    serve(args.model, args.host, args.port, args.threads, args.max_pending)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import numpy as np
+from scipy.sparse import csr_matrix, issparse
+from sklearn.preprocessing import normalize
+
+def top_k(scores, k):
+    # Índices dos k maiores scores positivos, em ordem decrescente, sem ordenar o vetor inteiro
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def top_k_rows(similarities, doc_ids, k, allowed=None):
+    # Top-k de cada linha de uma matriz CSR de scores (queries x candidatos);
+    # allowed(linha, colunas) opcionalmente restringe os candidatos de cada query
+    similarities = similarities.tocsr()
+    # Colunas em ordem crescente: empates desempatam pela ordem dos candidatos, como em top_k
+    similarities.sort_indices()
+    results = []
+    for row, (start, end) in enumerate(zip(similarities.indptr[:-1], similarities.indptr[1:])):
+        columns = similarities.indices[start:end]
+        row_scores = similarities.data[start:end]
+        if allowed is not None:
+            keep = allowed(row, columns)
+            columns, row_scores = columns[keep], row_scores[keep]
+        results.append([(int(doc_ids[columns[i]]), float(row_scores[i])) for i in top_k(row_scores, k)])
+    return results
+
+class CosineScorer:
+    """Pontua um conjunto de documentos candidatos (matriz CSR) contra uma ou várias queries.
+
+    Os candidatos são normalizados (L2) uma única vez; cada query vira um produto
+    matriz-vetor esparso e um lote de queries vira um único produto matriz-matriz.
+    """
+
+    def __init__(self, candidates, doc_ids=None, normalized=False):
+        candidates = csr_matrix(candidates)
+        self.candidates = candidates if normalized else normalize(candidates, norm='l2', copy=False)
+        self.doc_ids = np.arange(candidates.shape[0]) if doc_ids is None else np.asarray(doc_ids)
+
+    def __len__(self):
+        return self.candidates.shape[0]
+
+    def scores(self, query_vec):
+        query_vec = normalize(csr_matrix(query_vec), norm='l2')
+        return np.asarray((self.candidates @ query_vec.T).todense()).ravel()
+
+    def rank(self, query_vec, k=5):
+        scores = self.scores(query_vec)
+        return [(int(self.doc_ids[i]), float(scores[i])) for i in top_k(scores, k)]
+
+    def scores_many(self, query_vecs):
+        if not issparse(query_vecs):
+            query_vecs = csr_matrix(query_vecs)
+        query_vecs = normalize(query_vecs.tocsr(), norm='l2')
+        return (query_vecs @ self.candidates.T).tocsr()
+
+    def rank_many(self, query_vecs, k=5, allowed=None):
+        return top_k_rows(self.scores_many(query_vecs), self.doc_ids, k, allowed)
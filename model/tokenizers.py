@@ -0,0 +1,35 @@
+import re
+from functools import lru_cache
+
+# Sequências de letras/dígitos Unicode (\w sem o '_'), o mesmo critério do isalnum() do caminho NLTK
+WORD_PATTERN = re.compile(r'[^\W_]+')
+DEFAULT_TOKENIZER = 'regex'
+
+def regex_tokenize(text):
+    return WORD_PATTERN.findall(text.lower())
+
+@lru_cache(maxsize=None)
+def nltk_word_tokenize():
+    # Importa o NLTK e baixa o punkt só quando o tokenizador NLTK é usado de fato
+    # (a partir do NLTK 3.9 o word_tokenize carrega o recurso punkt_tab)
+    import nltk
+    from nltk.tokenize import word_tokenize
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        nltk.download('punkt_tab', quiet=True)
+    return word_tokenize
+
+def nltk_tokenize(text):
+    return [word.lower() for word in nltk_word_tokenize()(text) if word.isalnum()]
+
+TOKENIZERS = {
+    'regex': regex_tokenize,
+    'nltk': nltk_tokenize
+}
+
+def get_tokenizer(name=DEFAULT_TOKENIZER):
+    try:
+        return TOKENIZERS[name]
+    except KeyError:
+        raise ValueError(f"Tokenizador desconhecido: {name}. Opções: {', '.join(TOKENIZERS)}") from None
@@ -0,0 +1,47 @@
+import mmap
+
+from model.batch_reader import count_lines, iter_batch_offsets, read_batch, read_lines
+
+def map_file(path, content):
+    path.write_bytes(content)
+    file = open(path, 'rb')
+    return file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def test_batches_end_at_newlines_and_cover_the_file(tmp_path):
+    content = ''.join(f"linha {i} çã\n" for i in range(10)).encode('utf-8') + "sem quebra final".encode('utf-8')
+    file, mm = map_file(tmp_path / 'dados.txt', content)
+    with file, mm:
+        batches = list(iter_batch_offsets(mm, 3))
+        assert len(batches) == 4
+        assert batches[0][0] == 0 and batches[-1][1] == len(content)
+        assert all(previous[1] == current[0] for previous, current in zip(batches, batches[1:]))
+        assert all(content[end - 1:end] == b'\n' for _, end in batches[:-1])
+        lines = [line for start, end in batches for _, line in read_lines(mm, start, end)]
+    assert lines == [f"linha {i} çã" for i in range(10)] + ["sem quebra final"]
+
+def test_offsets_point_to_each_line_and_resume_from_an_offset(tmp_path):
+    content = b"primeira\nsegunda\nterceira\nquarta\n"
+    path = tmp_path / 'dados.txt'
+    file, mm = map_file(path, content)
+    with file, mm:
+        start, end = next(iter_batch_offsets(mm, 2))
+        pairs = read_lines(mm, start, end)
+        assert pairs == [(0, "primeira"), (9, "segunda")]
+        remaining = list(iter_batch_offsets(mm, 10, start=end))
+    assert remaining == [(end, len(content))]
+    assert read_batch(str(path), *remaining[0]) == [(17, "terceira"), (26, "quarta")]
+
+def test_dynamic_batch_size_is_read_per_batch(tmp_path):
+    file, mm = map_file(tmp_path / 'dados.txt', b"a\nb\nc\nd\ne\nf\n")
+    sizes = iter([1, 2, 3])
+    with file, mm:
+        batches = list(iter_batch_offsets(mm, lambda: next(sizes)))
+    assert [end - start for start, end in batches] == [2, 4, 6]
+
+def test_count_lines(tmp_path):
+    (tmp_path / 'vazio.txt').write_bytes(b"")
+    (tmp_path / 'com_quebra.txt').write_bytes(b"a\nb\n")
+    (tmp_path / 'sem_quebra.txt').write_bytes(b"a\nb")
+    assert count_lines(str(tmp_path / 'vazio.txt')) == 0
+    assert count_lines(str(tmp_path / 'com_quebra.txt')) == 2
+    assert count_lines(str(tmp_path / 'sem_quebra.txt'), block_size=1) == 2
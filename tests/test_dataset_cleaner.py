@@ -0,0 +1,60 @@
+import codecs
+
+import pytest
+
+from model.dataset_cleaner import clean_and_verify_dataset
+
+def baseline_clean(input_file, output_file, clean):
+    # Versão original, linha a linha com codecs: referência para a saída e as contagens
+    total_lines = cleaned_lines = 0
+    with codecs.open(input_file, 'r', encoding='utf-8', errors='replace') as infile, \
+         codecs.open(output_file, 'w', encoding='utf-8') as outfile:
+        for line in infile:
+            total_lines += 1
+            if clean:
+                clean_line = ''.join(char for char in line if char.isprintable() or char.isspace()).strip()
+                if clean_line:
+                    outfile.write(clean_line + '\n')
+                    cleaned_lines += 1
+            else:
+                outfile.write(line)
+    return total_lines, cleaned_lines
+
+SAMPLES = {
+    'controle': "linha\x00com\x07controle\x1b[0m\n\x01\x02\n  espaços  \n\tção\x7f\n",
+    'retorno': "windows\r\nmac\rvelho\r\n\r\nfim sem quebra",
+    'nel': "antes\x85depois separador\x0bvertical\x1cgrupo\n",
+    'multibyte': "ação " * 7 + "\n" + "😀 emoji 🇧🇷 e 中文 e ﻿ bom\n" * 5 + "éééé\n",
+    'vazio': "",
+}
+
+@pytest.mark.parametrize('clean', [False, True])
+@pytest.mark.parametrize('n_workers', [1, 2])
+@pytest.mark.parametrize('name', sorted(SAMPLES))
+def test_cleaner_matches_the_line_by_line_baseline(tmp_path, name, n_workers, clean):
+    content = SAMPLES[name].encode('utf-8')
+    reference_input = tmp_path / 'referencia.txt'
+    reference_input.write_bytes(content)
+    expected_counts = baseline_clean(str(reference_input), str(tmp_path / 'referencia.clean'), clean)
+    expected = (tmp_path / 'referencia.clean').read_bytes()
+
+    input_file = tmp_path / 'dados.txt'
+    input_file.write_bytes(content)
+    # Blocos de poucos bytes: as fronteiras caem em todo '\n', no meio do texto multibyte
+    outcome = clean_and_verify_dataset(str(input_file), clean=clean, n_workers=n_workers, chunk_size=7)
+    assert outcome["success"]
+    with open(outcome["output_file"], 'rb') as file:
+        assert file.read() == expected
+    assert (outcome["total_lines"], outcome["cleaned_lines"]) == expected_counts
+
+@pytest.mark.parametrize('n_workers', [1, 2])
+def test_invalid_utf8_lines_are_counted_and_keep_the_original(tmp_path, n_workers):
+    content = "válida\n".encode('utf-8') + b"quebrada \xc3\n" + b"\xff\xfe tamb\xe9m\r" + "ok ação\n".encode('utf-8')
+    input_file = tmp_path / 'dados.txt'
+    input_file.write_bytes(content)
+    outcome = clean_and_verify_dataset(str(input_file), clean=True, n_workers=n_workers, chunk_size=7)
+    assert outcome["success"] and outcome["problematic_lines"] == 2
+    assert outcome["output_file"] == str(input_file) + '.clean'
+    assert input_file.read_bytes() == content
+    with open(outcome["output_file"], encoding='utf-8') as file:
+        assert file.read() == "válida\nquebrada �\n�� tamb�m\nok ação\n"
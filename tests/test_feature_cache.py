@@ -0,0 +1,32 @@
+import os
+
+from scipy.sparse import csr_matrix
+
+from model.feature_cache import FeatureCache
+
+def write_entry(cache, key, source, n_documents=50):
+    writer = cache.writer(key, {'file_hash': key, 'source': source})
+    documents = [f"documento {i} " * 20 for i in range(n_documents)]
+    writer.write(0, 100, list(range(n_documents)), documents, csr_matrix((n_documents, 8)))
+    writer.commit()
+
+def test_new_entry_replaces_older_entries_of_the_same_source(tmp_path):
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    write_entry(cache, 'a1', '/dados/a.txt')
+    write_entry(cache, 'b1', '/dados/b.txt')
+    write_entry(cache, 'a2', '/dados/a.txt')
+    assert sorted(key for key, _, _ in cache.entries()) == ['a2', 'b1']
+
+def test_size_cap_evicts_least_recently_used_entries(tmp_path):
+    cache = FeatureCache(str(tmp_path / 'cache'))
+    for number, key in enumerate(('a', 'b', 'c')):
+        write_entry(cache, key, f'/dados/{key}.txt')
+        manifest = os.path.join(cache.path(key), 'manifest.json')
+        os.utime(manifest, (1000 + number, 1000 + number))
+    # Ler 'a' o torna o mais recente
+    list(cache.iter_batches('a', 10))
+    entry_size = cache.entry_bytes('a', cache.manifest('a'))
+
+    cache.max_bytes = 3 * entry_size
+    write_entry(cache, 'd', '/dados/d.txt')
+    assert sorted(key for key, _, _ in cache.entries()) == ['a', 'c', 'd']
@@ -0,0 +1,44 @@
+import os
+
+import model.content_ranker as content_ranker
+import utils.file_hash as file_hash
+from utils.file_hash import FileDigestCache, file_digest
+
+def test_digest_is_reused_until_the_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / 'dados.txt'
+    path.write_text("um\ndois\n", encoding='utf-8')
+    cache = FileDigestCache(str(tmp_path / 'cache' / 'digests.json'))
+    expected = file_digest(str(path))
+    assert cache.digest(str(path)) == expected
+
+    reads = []
+    monkeypatch.setattr(file_hash, 'file_digest', lambda file_path: reads.append(file_path) or 'relido')
+    assert cache.digest(str(path)) == expected
+    assert reads == []
+
+    path.write_text("um\ndois\ntrês\n", encoding='utf-8')
+    assert cache.digest(str(path)) == 'relido'
+    assert len(reads) == 1
+
+def test_train_with_clean_reuses_the_clean_copy_and_its_digest(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dataset = tmp_path / 'dados.txt'
+    dataset.write_text(''.join(f"documento {i} sobre o tema {i % 5}\n" for i in range(500)), encoding='utf-8')
+    ranker = content_ranker.ContentRanker(n_clusters=3, batch_size=100, checkpoint_dir=str(tmp_path / 'checkpoints'),
+                                          db_path=str(tmp_path / 'ranker.db'), feature_cache_dir=None)
+    assert ranker.train(str(dataset), clean=True)["result"] == "completed"
+    assert ranker.file_hash == file_digest(str(dataset) + '.clean')
+
+    cleanings, reads = [], []
+    monkeypatch.setattr(content_ranker, 'clean_and_verify_dataset', lambda *args, **kwargs: cleanings.append(args))
+    monkeypatch.setattr(file_hash, 'file_digest', lambda file_path: reads.append(file_path))
+    assert ranker.train(str(dataset), clean=True)["result"] == "completed"
+    assert cleanings == [] and reads == []
+
+    # Dataset alterado: a cópia limpa é refeita
+    with open(dataset, 'a', encoding='utf-8') as file:
+        file.write("documento novo\n")
+    os.utime(dataset, ns=(0, os.stat(dataset).st_mtime_ns + 1))
+    ranker.train(str(dataset), clean=True)
+    assert len(cleanings) == 1
+    ranker.store.close()
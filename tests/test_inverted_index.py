@@ -0,0 +1,55 @@
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from model.content_ranker import ContentRanker
+from model.document_store import DocumentStore
+from model.inverted_index import frequent_feature_limit
+
+def test_database_from_before_the_index_is_reindexed_on_open(tmp_path):
+    # Esquema do banco original: só id e conteúdo
+    db_path = str(tmp_path / 'antigo.db')
+    connection = sqlite3.connect(db_path)
+    connection.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY, content TEXT)")
+    connection.executemany("INSERT INTO documents (content) VALUES (?)",
+                           [("python lista compreensão",), ("receita de bolo de cenoura",), ("python dicionário",)])
+    connection.commit()
+    connection.close()
+
+    ranker = ContentRanker(n_clusters=2, db_path=db_path, checkpoint_dir=str(tmp_path / 'checkpoints'),
+                           feature_cache_dir=None)
+    assert ranker.store.unindexed_documents(1) == []
+    assert [doc_id for doc_id, _ in ranker.rank_content("bolo de cenoura", k=1)] == [2]
+    assert {doc_id for doc_id, _ in ranker.rank_content("python", k=2)} == {1, 3}
+    ranker.store.close()
+
+def test_search_with_stopwords_reads_only_rare_posting_lists(tmp_path):
+    rng = np.random.default_rng(0)
+    stopwords = "de a o que e do da em um para com não uma os no se na por mais as dos como mas".split()
+    topics = [f"assunto{i}" for i in range(2000)]
+    documents = [' '.join(list(rng.choice(stopwords, 12)) + list(rng.choice(topics, 3))) for _ in range(20000)]
+    vectorizer = HashingVectorizer(n_features=2**18, alternate_sign=False)
+    X = vectorizer.transform(documents)
+    store = DocumentStore(str(tmp_path / 'ranker.db'))
+    store.add_documents(documents, X)
+
+    queries = [(topics[i], topics[i + 1]) for i in range(0, 40, 2)]
+    query_vecs = vectorizer.transform([f"o que é o {first} e como se faz para usar o {second} na prática"
+                                       for first, second in queries])
+    max_df = frequent_feature_limit(store.max_id())
+    started = time.perf_counter()
+    results = [store.index.search(query_vecs[i], 5, max_df) for i in range(len(queries))]
+    elapsed = (time.perf_counter() - started) / len(queries)
+    store.close()
+
+    exact_scores = (X @ query_vecs.T).toarray()
+    for i, ranked in enumerate(results):
+        assert len(ranked) == 5
+        for doc_id, score in ranked:
+            # Os termos frequentes continuam somando no score dos candidatos
+            assert score == pytest.approx(exact_scores[doc_id - 1, i])
+            assert set(queries[i]) & set(documents[doc_id - 1].split())
+    assert elapsed < 0.05
@@ -0,0 +1,33 @@
+from model.memory_governor import MemoryGovernor
+
+def governor(monkeypatch, rss, system_pressure=False):
+    governor = MemoryGovernor(8000, budget_mb=100, min_batch_size=1000)
+    def measure():
+        governor.rss = rss
+        return rss
+    monkeypatch.setattr(governor, 'measure', measure)
+    monkeypatch.setattr(governor, 'system_under_pressure', lambda: system_pressure)
+    return governor
+
+def test_batch_shrinks_once_per_batch_over_budget(monkeypatch):
+    memory = governor(monkeypatch, rss=200e6)
+    for expected in (4000, 2000, 1000, 1000):
+        memory.wait_for_memory()
+        memory.observe()
+        assert memory.batch_size() == expected
+    assert memory.shrinks == 3
+    assert [decision["action"] for decision in memory.decisions] == ["reduzir"] * 3
+
+def test_budget_and_system_pressure_shrink_once(monkeypatch):
+    memory = governor(monkeypatch, rss=200e6, system_pressure=True)
+    memory.max_wait = 0
+    memory.wait_for_memory()
+    memory.observe()
+    assert memory.batch_size() == 4000 and memory.shrinks == 1
+
+def test_observe_alone_shrinks_near_the_budget_and_grows_with_room(monkeypatch):
+    memory = governor(monkeypatch, rss=90e6)
+    assert memory.observe() == 4000
+    assert memory.observe() == 2000
+    memory.measure = lambda: 10e6
+    assert memory.observe() == 2500
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from model.model_io import build_kmeans, kmeans_arrays, kmeans_config
+
+def restored(kmeans):
+    params, state = kmeans_config(kmeans)
+    return build_kmeans(params, state, {name: np.array(array) for name, array in kmeans_arrays(kmeans).items()})
+
+def test_restored_kmeans_continues_like_the_original():
+    rng = np.random.default_rng(0)
+    batches = [rng.random((200, 8)) for _ in range(4)]
+    original = MiniBatchKMeans(n_clusters=4, batch_size=200, random_state=3, reassignment_ratio=0.5)
+    for X in batches[:2]:
+        original.partial_fit(X)
+    # O gerador aleatório é salvo junto: a retomada não recomeça a sequência da semente
+    copy = restored(original)
+    for X in batches[2:]:
+        original.partial_fit(X)
+        copy.partial_fit(X)
+    np.testing.assert_array_equal(copy.cluster_centers_, original.cluster_centers_)
+    assert copy._random_state.get_state()[2] == original._random_state.get_state()[2]
+
+def test_thread_count_falls_back_without_the_private_helper(monkeypatch):
+    original = MiniBatchKMeans(n_clusters=2, batch_size=10, random_state=0).partial_fit(np.eye(4))
+    monkeypatch.setitem(sys.modules, 'sklearn.utils._openmp_helpers', None)
+    assert restored(original)._n_threads == (os.cpu_count() or 1)
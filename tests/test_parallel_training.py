@@ -0,0 +1,31 @@
+import numpy as np
+
+from model.content_ranker import ContentRanker
+
+def write_dataset(path, n_lines):
+    with open(path, 'w', encoding='utf-8') as file:
+        for i in range(n_lines):
+            file.write(f"documento {i} sobre o tema {i % 11} com a palavra termo{i % 97}\n")
+    return str(path)
+
+def train(directory, file_path, n_workers):
+    directory.mkdir()
+    ranker = ContentRanker(n_clusters=6, batch_size=500, checkpoint_interval=10**9, n_workers=n_workers,
+                           checkpoint_dir=str(directory / 'checkpoints'), db_path=str(directory / 'ranker.db'),
+                           feature_cache_dir=None)
+    ranker.kmeans.set_params(random_state=0)
+    assert ranker.train(file_path)["result"] == "completed"
+    return ranker
+
+def test_parallel_training_matches_sequential(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    file_path = write_dataset(tmp_path / 'dados.txt', 3000)
+    sequential = train(tmp_path / 'sequencial', file_path, n_workers=1)
+    parallel = train(tmp_path / 'paralelo', file_path, n_workers=2)
+
+    np.testing.assert_array_equal(parallel.kmeans.cluster_centers_, sequential.kmeans.cluster_centers_)
+    query = "SELECT id, content, vector, cluster, byte_offset, content_hash FROM documents ORDER BY id"
+    assert parallel.store.connection.execute(query).fetchall() == \
+        sequential.store.connection.execute(query).fetchall()
+    sequential.store.close()
+    parallel.store.close()
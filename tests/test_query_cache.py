@@ -0,0 +1,19 @@
+from model.content_ranker import ContentRanker
+
+def test_each_question_counts_once_in_the_cache(tmp_path, monkeypatch):
+    ranker = ContentRanker(n_clusters=2, db_path=str(tmp_path / 'ranker.db'),
+                           checkpoint_dir=str(tmp_path / 'checkpoints'), feature_cache_dir=None)
+    dataset = tmp_path / 'dados.txt'
+    dataset.write_text("python lista compreensão\nreceita de bolo de cenoura\npython dicionário\n", encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    assert ranker.train(str(dataset))["result"] == "completed"
+
+    calls = []
+    preprocess_text = ranker.preprocess_text
+    ranker.preprocess_text = lambda text: calls.append(text) or preprocess_text(text)
+    first = ranker.answer_query("Bolo de cenoura?")
+    assert ranker.answer_query("bolo de cenoura") == first.replace("Bolo de cenoura?", "bolo de cenoura")
+    stats = ranker.query_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert len(calls) == 2
+    ranker.store.close()
@@ -0,0 +1,41 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from model.content_ranker import ContentRanker
+from model.query_server import QueryServer
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dataset = tmp_path / 'dados.txt'
+    dataset.write_text("python lista compreensão\nreceita de bolo de cenoura\npython dicionário\n", encoding='utf-8')
+    ranker = ContentRanker(n_clusters=2, db_path=str(tmp_path / 'ranker.db'),
+                           checkpoint_dir=str(tmp_path / 'checkpoints'), feature_cache_dir=None)
+    assert ranker.train(str(dataset))["result"] == "completed"
+    server = QueryServer(ranker, port=0, n_threads=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    ranker.store.close()
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+def test_malformed_bodies_get_400_and_are_counted(server):
+    for body in (b'{"query": 5}', b'[1, 2]', b'"texto"', b'{"query": "bolo", "k": "muitos"}', b'{oops'):
+        status, payload = request(server, 'POST', '/query', body)
+        assert status == 400 and payload["error"]
+    status, payload = request(server, 'POST', '/query', json.dumps({"query": "bolo de cenoura", "k": 1}).encode())
+    assert status == 200 and payload["results"][0]["id"] == 2
+    assert request(server, 'GET', '/metrics')[1]["latency"]["bad_requests"] == 5
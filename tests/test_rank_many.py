@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from model.content_ranker import ContentRanker
+
+QUERIES = ["o que é o assunto3 e como se faz", "receita de assunto7 com assunto12", "assunto40",
+           "o que é isso", "palavra que não existe", "de a o que e"]
+
+@pytest.fixture
+def ranker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(0)
+    stopwords = "de a o que e do da em um para com não uma os no se".split()
+    with open(tmp_path / 'dados.txt', 'w', encoding='utf-8') as file:
+        for i in range(3000):
+            words = list(rng.choice(stopwords, 8)) + [f"assunto{j}" for j in rng.integers(0, 60, 2)]
+            file.write(f"{' '.join(words)} documento{i}\n")
+    ranker = ContentRanker(n_clusters=6, batch_size=1000, checkpoint_interval=10**9, feature_cache_dir=None,
+                           checkpoint_dir=str(tmp_path / 'checkpoints'), db_path=str(tmp_path / 'ranker.db'))
+    assert ranker.train(str(tmp_path / 'dados.txt'))["result"] == "completed"
+    yield ranker
+    ranker.store.close()
+
+@pytest.mark.parametrize('n_probe', [None, 2])
+def test_rank_many_matches_rank_content(ranker, n_probe):
+    batched = list(ranker.rank_many(QUERIES, k=5, n_probe=n_probe, batch_size=4))
+    looped = [ranker.rank_content(query, k=5, n_probe=n_probe) for query in QUERIES]
+    assert [[doc_id for doc_id, _ in ranked] for ranked in batched] == \
+        [[doc_id for doc_id, _ in ranked] for ranked in looped]
+    for batch_ranked, loop_ranked in zip(batched, looped):
+        np.testing.assert_allclose([score for _, score in batch_ranked], [score for _, score in loop_ranked])
+    assert any(looped)
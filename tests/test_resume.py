@@ -0,0 +1,121 @@
+import pytest
+
+from model.content_ranker import MODEL_PATH, ContentRanker, load_model
+
+def write_dataset(path, prefix, n_lines):
+    with open(path, 'w', encoding='utf-8') as file:
+        for i in range(n_lines):
+            file.write(f"{prefix} documento {i} sobre o tema {i % 7} com a palavra {prefix}{i}\n")
+    return str(path)
+
+def new_ranker(directory, **kwargs):
+    return ContentRanker(n_clusters=5, batch_size=1000, checkpoint_interval=10**9, n_workers=1,
+                         checkpoint_dir=str(directory / 'checkpoints'), db_path=str(directory / 'ranker.db'),
+                         feature_cache_dir=None, **kwargs)
+
+def interrupt_after(ranker, n_documents):
+    # Interrompe o treinamento assim que o total de documentos processados chega a n_documents
+    def print_progress():
+        if ranker.processed_documents_count >= n_documents:
+            ranker.interrupt()
+    ranker.print_progress = print_progress
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # O modelo final é gravado no diretório atual
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def test_retraining_a_finished_file_keeps_documents_from_other_files(workdir):
+    file_a = write_dataset(workdir / 'a.txt', 'alfa', 5000)
+    file_b = write_dataset(workdir / 'b.txt', 'beta', 4000)
+
+    ranker = new_ranker(workdir)
+    assert ranker.train(file_a)["result"] == "completed"
+    assert ranker.store.count() == 5000
+
+    # B é interrompido antes do primeiro checkpoint periódico
+    interrupt_after(ranker, 7000)
+    assert ranker.train(file_b)["result"] == "interrupted"
+    assert ranker.store.count() == 7000
+    ranker.store.close()
+
+    ranker = new_ranker(workdir)
+    assert ranker.train(file_a)["result"] == "completed"
+    assert ranker.store.count() == 7000
+    ranker.store.close()
+
+def test_resume_discards_only_uncheckpointed_documents_of_the_same_file(workdir):
+    file_a = write_dataset(workdir / 'a.txt', 'alfa', 5000)
+    file_b = write_dataset(workdir / 'b.txt', 'beta', 4000)
+
+    # Sem deduplicação, um documento de A que não fosse descartado seria gravado de novo
+    ranker = new_ranker(workdir, dedup=None)
+    interrupt_after(ranker, 2000)
+    assert ranker.train(file_a)["result"] == "interrupted"
+    ranker.save_checkpoint(wait=True)
+    # Documentos de A gravados depois do checkpoint (por exemplo, antes de uma queda) e,
+    # em seguida, documentos de B
+    ranker.file_path = file_a
+    ranker.save_documents_to_db([f"alfa documento {i} sobre o tema {i % 7} com a palavra alfa{i}"
+                                 for i in range(2000, 2500)])
+    ranker.file_path = file_b
+    ranker.save_documents_to_db(["beta documento extra", "beta outro documento extra"])
+    ranker.store.close()
+
+    ranker = new_ranker(workdir, dedup=None)
+    assert ranker.train(file_a)["result"] == "completed"
+    assert ranker.store.count() == 5000 + 2
+    ranker.store.close()
+
+def test_checkpoint_does_not_override_runtime_settings(workdir):
+    file_a = write_dataset(workdir / 'a.txt', 'alfa', 2000)
+    assert new_ranker(workdir).train(file_a)["result"] == "completed"
+
+    ranker = new_ranker(workdir, n_probe=5, cache_ttl=5, cache_size=10, projection_rerank=3)
+    assert ranker.train(file_a)["result"] == "completed"
+    assert (ranker.n_probe, ranker.query_cache.ttl, ranker.query_cache.max_size, ranker.projection_rerank) == \
+        (5, 5, 10, 3)
+    ranker.store.close()
+
+    # O modelo salvo leva as configurações junto
+    model = load_model(MODEL_PATH)
+    assert (model.n_probe, model.query_cache.ttl) == (5, 5)
+    model.store.close()
+
+def test_clusters_are_reassigned_only_after_enough_new_documents(workdir):
+    file_a = write_dataset(workdir / 'a.txt', 'alfa', 5000)
+    file_b = write_dataset(workdir / 'b.txt', 'beta', 100)
+
+    ranker = new_ranker(workdir)
+    assert 'train.reassign' in ranker.train(file_a)["metrics"]["stages"]
+    # Arquivo já no fim: nenhum documento novo
+    assert 'train.reassign' not in ranker.train(file_a)["metrics"]["stages"]
+    # 100 documentos novos em 5100 ficam abaixo de reassign_fraction
+    assert 'train.reassign' not in ranker.train(file_b)["metrics"]["stages"]
+    assert ranker.documents_since_reassign == 100
+    ranker.reassign_clusters()
+    assert ranker.documents_since_reassign == 0
+    ranker.store.close()
+
+def test_new_model_on_a_shared_database_trains_on_stored_documents(workdir):
+    file_a = write_dataset(workdir / 'a.txt', 'alfa', 3000)
+    ranker = new_ranker(workdir)
+    assert ranker.train(file_a)["result"] == "completed"
+    ranker.store.close()
+
+    # Outro modelo, com checkpoints próprios, sobre o mesmo banco e o mesmo arquivo
+    other = ContentRanker(n_clusters=5, batch_size=1000, checkpoint_interval=10**9, n_workers=1,
+                          checkpoint_dir=str(workdir / 'outros_checkpoints'), db_path=str(workdir / 'ranker.db'),
+                          feature_cache_dir=None)
+    assert not other.is_trained()
+    outcome = other.train(file_a)
+    assert outcome["result"] == "completed"
+    assert (outcome["documents_processed"], outcome["duplicates_skipped"]) == (3000, 3000)
+    assert other.store.count() == 3000
+    assert other.is_trained() and not other.fit_stored_duplicates
+    other.store.close()
+
+    model = load_model(MODEL_PATH)
+    assert model.has_centroids()
+    model.store.close()
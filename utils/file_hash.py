@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+
+def new_digest():
+    return hashlib.blake2b(digest_size=20)
+
+def file_digest(file_path, chunk_size=1 << 20):
+    # Hash BLAKE2b do conteúdo do arquivo, lido em blocos para não carregar tudo na memória
+    digest = new_digest()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb') as file:
+        while True:
+            read = file.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+def file_signature(file_path):
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+class FileDigestCache:
+    """Hashes de arquivos guardados em um JSON, válidos enquanto o tamanho e o mtime não mudam;
+    evita reler datasets inteiros só para identificá-los."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def entry(self, file_path):
+        try:
+            signature = file_signature(file_path)
+        except OSError:
+            return None
+        entry = self.load().get(os.path.abspath(file_path))
+        if entry and all(entry.get(key) == value for key, value in signature.items()):
+            return entry
+        return None
+
+    def store(self, file_path, digest, **metadata):
+        entries = self.load()
+        entries[os.path.abspath(file_path)] = dict(file_signature(file_path), hash=digest, **metadata)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f'{self.path}.temp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(entries, file, indent=2)
+        os.replace(temp_path, self.path)
+
+    def digest(self, file_path):
+        entry = self.entry(file_path)
+        if entry:
+            return entry['hash']
+        digest = file_digest(file_path)
+        self.store(file_path, digest)
+        return digest
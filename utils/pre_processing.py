@@ -1,17 +1,63 @@
 import PyPDF2
+import json
+import os
 import re
 import spacy
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-# Carregar o modelo spaCy em português
-nlp = spacy.load('pt_core_news_sm')
+from utils.file_hash import file_digest
 
-def extract_text_from_pdf(pdf_path):
+# Modelo spaCy em português; só lemas e stopwords são usados, então parser e NER ficam desligados
+SPACY_MODEL = 'pt_core_news_sm'
+SPACY_DISABLED = ('parser', 'ner')
+SPACY_BATCH_SIZE = 64
+# Parágrafos sem linha em branco (comum em PDFs) são cortados neste tamanho
+PARAGRAPH_MAX_CHARS = 20000
+
+# Manifesto em output_dir: hash de cada entrada já processada e a configuração usada.
+# Incrementar PREPROCESSING_VERSION ao mudar clean_text/preprocess_portuguese_text.
+PREPROCESSING_VERSION = 2
+MANIFEST_FILE = '.preprocess_manifest.json'
+# Páginas extraídas por tarefa no pool de processos
+PDF_PAGES_PER_TASK = 8
+
+@lru_cache(maxsize=None)
+def load_nlp():
+    # Carregado na primeira utilização, não na importação do módulo
+    return spacy.load(SPACY_MODEL, disable=list(SPACY_DISABLED))
+
+def extract_pages(pdf_path, start, end):
+    # Executado nos processos do pool: cada tarefa abre o PDF e extrai só o seu intervalo de páginas
     with open(pdf_path, 'rb') as file:
         reader = PyPDF2.PdfReader(file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-    return text
+        return [(reader.pages[number].extract_text() or '') for number in range(start, end)]
+
+def iter_pdf_pages(pdf_path, n_workers=None, pages_per_task=PDF_PAGES_PER_TASK):
+    # Texto de cada página, na ordem do livro, com no máximo 2 * n_workers tarefas pendentes
+    with open(pdf_path, 'rb') as file:
+        n_pages = len(PyPDF2.PdfReader(file).pages)
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or n_pages <= pages_per_task:
+        yield from extract_pages(pdf_path, 0, n_pages)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = deque()
+        for start in range(0, n_pages, pages_per_task):
+            pending.append(executor.submit(extract_pages, pdf_path, start, min(start + pages_per_task, n_pages)))
+            if len(pending) >= 2 * n_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def iter_pdf_lines(pdf_path, n_workers=None):
+    for page in iter_pdf_pages(pdf_path, n_workers):
+        yield from page.splitlines()
+
+def extract_text_from_pdf(pdf_path, n_workers=None):
+    return ''.join(page + "\n" for page in iter_pdf_pages(pdf_path, n_workers))
 
 def clean_text(text):
     # Remover números de página, cabeçalhos, rodapés
@@ -29,35 +75,111 @@ def clean_text(text):
     
     return text
 
-def preprocess_portuguese_text(text):
-    doc = nlp(text)
-    
-    # Tokenização, lematização e remoção de stopwords
-    processed_tokens = [token.lemma_.lower() for token in doc if not token.is_stop and not token.is_punct and token.is_alpha]
-    
-    return " ".join(processed_tokens)
+def iter_paragraphs(lines, max_chars=PARAGRAPH_MAX_CHARS):
+    # Agrupa linhas em parágrafos (separados por linha em branco), já sem números de página e
+    # títulos de capítulo, para o spaCy processar um texto pequeno por vez
+    paragraph = []
+    size = 0
+    for line in lines:
+        line = line.strip()
+        if line.isdigit() or 'Capítulo' in line:
+            continue
+        if line:
+            paragraph.append(line)
+            size += len(line)
+        if paragraph and (not line or size >= max_chars):
+            yield ' '.join(paragraph)
+            paragraph = []
+            size = 0
+    if paragraph:
+        yield ' '.join(paragraph)
+
+def preprocess_paragraphs(paragraphs, batch_size=SPACY_BATCH_SIZE, n_process=1):
+    cleaned = (text for text in map(clean_text, paragraphs) if text)
+    for doc in load_nlp().pipe(cleaned, batch_size=batch_size, n_process=n_process):
+        # Tokenização, lematização e remoção de stopwords
+        processed_tokens = [token.lemma_.lower() for token in doc if not token.is_stop and not token.is_punct and token.is_alpha]
+        if processed_tokens:
+            yield " ".join(processed_tokens)
+
+def preprocess_portuguese_text(text, batch_size=SPACY_BATCH_SIZE, n_process=1):
+    return " ".join(preprocess_paragraphs(iter_paragraphs(text.splitlines()), batch_size, n_process))
+
+def preprocessing_config():
+    return {'version': PREPROCESSING_VERSION, 'spacy_model': SPACY_MODEL, 'spacy_version': spacy.__version__,
+            'spacy_disabled': list(SPACY_DISABLED), 'paragraph_max_chars': PARAGRAPH_MAX_CHARS}
 
-def preprocess_files(input_dir, output_dir):
-    import os
+def write_processed(lines, output_path, batch_size=SPACY_BATCH_SIZE, n_process=1):
+    # Um parágrafo processado por linha, gravado conforme sai do nlp.pipe
+    temp_path = output_path + '.temp'
+    paragraphs = 0
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        for processed in preprocess_paragraphs(iter_paragraphs(lines), batch_size, n_process):
+            file.write(processed + '\n')
+            paragraphs += 1
+    os.replace(temp_path, output_path)
+    return paragraphs
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.temp', 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + '.temp', path)
+
+def is_unchanged(entry, input_path, config):
+    # Mesmo mtime e tamanho dispensam ler o arquivo; senão o hash decide
+    stat = os.stat(input_path)
+    if not entry or entry['config'] != config:
+        return False, stat, None
+    if entry.get('mtime') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+        return True, stat, entry['hash']
+    input_hash = file_digest(input_path)
+    return entry['hash'] == input_hash, stat, input_hash
+
+def preprocess_files(input_dir, output_dir, batch_size=SPACY_BATCH_SIZE, n_process=1, pdf_workers=None):
     os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    config = preprocessing_config()
     
     for filename in os.listdir(input_dir):
         input_path = os.path.join(input_dir, filename)
         if filename.endswith('.pdf'):
-            text = extract_text_from_pdf(input_path)
             output_filename = f"processed_{os.path.splitext(filename)[0]}.txt"
         elif filename.endswith('.txt'):
-            with open(input_path, 'r', encoding='utf-8') as file:
-                text = file.read()
             output_filename = f"processed_{filename}"
         else:
             continue
-        
-        cleaned_text = clean_text(text)
-        processed_text = preprocess_portuguese_text(cleaned_text)
-        
         output_path = os.path.join(output_dir, output_filename)
-        with open(output_path, 'w', encoding='utf-8') as file:
-            file.write(processed_text)
+
+        # Pula entradas cujo conteúdo e configuração não mudaram desde o último processamento
+        entry = manifest.get(filename)
+        unchanged, stat, input_hash = is_unchanged(entry, input_path, config)
+        if unchanged and os.path.exists(output_path):
+            if entry.get('mtime') != stat.st_mtime_ns:
+                # Só o mtime mudou (arquivo copiado ou tocado): atualiza o manifesto sem reprocessar
+                manifest[filename] = dict(entry, mtime=stat.st_mtime_ns, size=stat.st_size)
+                save_manifest(output_dir, manifest)
+            print(f"Sem alterações: {filename}")
+            continue
+        if input_hash is None:
+            input_hash = file_digest(input_path)
+
+        # As páginas são extraídas em paralelo e processadas conforme chegam, sem montar o livro inteiro
+        if filename.endswith('.pdf'):
+            write_processed(iter_pdf_lines(input_path, pdf_workers), output_path, batch_size, n_process)
+        else:
+            with open(input_path, 'r', encoding='utf-8') as file:
+                write_processed(file, output_path, batch_size, n_process)
+
+        manifest[filename] = {'hash': input_hash, 'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+                              'config': config, 'output': output_filename}
+        save_manifest(output_dir, manifest)
         
         print(f"Preprocessed: {filename}")
\ No newline at end of file